@@ -1,26 +1,70 @@
-import adsk.core
-import adsk.fusion
-import traceback
+import os
 from .Modules import KLE
-from .Modules import Switches
-from .Modules import Layers
 from .Modules import Config
+from .Modules import Trace
+from .Modules import Validate
 
+# Only parsing and validation are imported up front. Every other stage
+# imports its modules when it runs, so the Fusion API and optional
+# features are never loaded for runs that don't use them, and main() runs
+# as plain Python until the first Fusion stage.
 
-def main():
-    keys = KLE.get_keys()
-    Layers.full_case(keys)
-    if Config.INSERT_SWITCHES:
-        Switches.place_switches(keys)
+
+def main(file_name=None):
+    if file_name is None:
+        file_name = KLE.select_file()
+        if file_name is None:
+            return
+    Trace.start()
+    # A failed run still stops tracing and writes what it got through
+    try:
+        with Trace.stage('main.get_keys'):
+            keys = KLE.get_keys(file_name)
+        if Config.VALIDATE:
+            with Trace.stage('main.validate'):
+                Validate.validate(keys)
+        with Trace.stage('main.full_case'):
+            from .Modules import Layers
+            Layers.full_case(keys)
+        if Config.INSERT_SWITCHES:
+            with Trace.stage('main.place_switches'):
+                from .Modules import Switches
+                Switches.place_switches(keys)
+        if Config.INSERT_KEYCAPS:
+            with Trace.stage('main.place_keycaps'):
+                from .Modules import Keycaps
+                Keycaps.place_keycaps(keys)
+        if Config.EXPORT_DXFS:
+            name = os.path.splitext(os.path.basename(file_name))[0]
+            with Trace.stage('main.export'):
+                from .Modules import Export
+                Export.export_layout(
+                    keys, Config.EXPORT_DIR or os.path.dirname(file_name),
+                    name)
+    finally:
+        trace_file = Trace.finish(file_name)
+    return trace_file
 
 
 def run(context):
     """This function will be called by fusion as the "main" method."""
+    import traceback
+    import adsk.core
     ui = None
     try:
         app = adsk.core.Application.get()
         ui = app.userInterface
-        main()
+        if Config.BATCH_SOURCE:
+            from .Modules import Batch
+            Batch.run_batch(Config.BATCH_SOURCE, main)
+        else:
+            trace_file = main()
+            if trace_file:
+                ui.messageBox('{}\n\nTrace written to {}'.format(
+                    Trace.summary(), trace_file))
+    except Validate.LayoutError as error:
+        if ui:
+            ui.messageBox(str(error))
     except:
         if ui:
             ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
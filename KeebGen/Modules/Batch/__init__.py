@@ -0,0 +1,87 @@
+import json
+import os
+import time
+import traceback
+import adsk.core
+from .. import Cache
+from .. import Config
+
+
+def layout_files(source):
+    # A directory of KLE JSON files, or a JSON manifest of the form
+    # {"layouts": ["path/to/layout.json", ...], "config": {"NAME": value}}
+    # with layout paths relative to the manifest
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, name)
+                      for name in os.listdir(source)
+                      if name.lower().endswith('.json')), {}
+    with open(source, 'r', encoding='utf-8') as fp:
+        manifest = json.load(fp)
+    base = os.path.dirname(os.path.abspath(source))
+    files = [os.path.join(base, name) for name in manifest['layouts']]
+    return files, manifest.get('config', {})
+
+
+def apply_config(overrides):
+    # Returns the previous values so they can be restored after the batch
+    previous = {}
+    for name, value in overrides.items():
+        if not name.isupper() or not hasattr(Config, name):
+            raise ValueError('Unknown config value: {}'.format(name))
+        previous[name] = getattr(Config, name)
+        setattr(Config, name, value)
+    return previous
+
+
+def run_batch(source, build, config=None):
+    """Build every layout in source into its own design, without dialogs"""
+    app = adsk.core.Application.get()
+    files, overrides = layout_files(source)
+    overrides = dict(overrides, **(config or {}))
+    previous = apply_config(overrides)
+    results = []
+    try:
+        cache_before = Cache.stats()
+        if Config.INSERT_SWITCHES and not Config.SWITCH_FILE and \
+                not all(model['file']
+                        for model in Config.SWITCH_MODELS.values()):
+            raise ValueError('Batch switch insertion needs SWITCH_FILE set')
+        if Config.INSERT_KEYCAPS and not Config.KEYCAP_DIR:
+            raise ValueError('Batch keycap insertion needs KEYCAP_DIR set')
+        for file_name in files:
+            start = time.perf_counter()
+            error = None
+            try:
+                app.documents.add(
+                    adsk.core.DocumentTypes.FusionDesignDocumentType)
+                build(file_name)
+            except:
+                # Keep going, the failure is reported with the summary
+                error = traceback.format_exc()
+            results.append(dict(file=file_name, error=error,
+                                seconds=time.perf_counter() - start))
+        cache = Cache.stats_since(cache_before)
+    finally:
+        apply_config(previous)
+
+    app.userInterface.messageBox(summary(results, cache))
+    return results
+
+
+def summary(results, cache=None):
+    lines = []
+    for result in results:
+        status = 'FAILED' if result['error'] else 'ok'
+        lines.append('{}: {} ({:.1f}s)'.format(
+            os.path.basename(result['file']), status, result['seconds']))
+    failures = [result for result in results if result['error']]
+    lines.append('')
+    lines.append('{} built, {} failed, {:.1f}s total'.format(
+        len(results) - len(failures), len(failures),
+        sum(result['seconds'] for result in results)))
+    if cache:
+        lines.append(Cache.describe(cache))
+    for result in failures:
+        lines.append('')
+        lines.append('{}:\n{}'.format(result['file'], result['error']))
+    return '\n'.join(lines)
@@ -0,0 +1,177 @@
+import csv
+import json
+import os
+import tempfile
+import time
+from .. import Cache
+from .. import Config
+from .. import Geometry
+from .. import Layout
+from .. import Mounting
+from .. import Standin
+
+
+# Times each stage of the layout-to-case pipeline, on the sample-data
+# layouts and on synthetic layouts of increasing size. Runs against the adsk
+# stand-in when Fusion isn't there. From the repository root:
+#   python -m KeebGen.Modules.Benchmark [layout.json ...] [--sizes 500,5000]
+#   [--repeat 3] [--json results.json] [--csv results.csv]
+
+SIZES = (500, 1000, 2000, 5000)
+
+
+def synthetic_layout(count, rotated):
+    # KLE rows of 1u keys. Rotated layouts are made of 50 key clusters,
+    # 5 rows of 10, tilted alternately left and right around their corner.
+    rows = []
+    if not rotated:
+        for start in range(0, count, 20):
+            rows.append(['k'] * min(20, count - start))
+        return rows
+    for cluster, start in enumerate(range(0, count, 50)):
+        size = min(50, count - start)
+        origin = dict(r=15 if cluster % 2 else -15,
+                      rx=12 * (cluster % 10), ry=7 * (cluster // 10))
+        for row_start in range(0, size, 10):
+            row = ['k'] * min(10, size - row_start)
+            if row_start == 0:
+                row.insert(0, origin)
+            rows.append(row)
+    return rows
+
+
+def layouts(files, sizes, directory):
+    # (name, path) for every layout to run, synthetic ones are written to
+    # directory so parsing is timed too
+    for file_name in files:
+        yield os.path.splitext(os.path.basename(file_name))[0], file_name
+    for size in sizes:
+        for rotated in (False, True):
+            name = 'synthetic-{}{}'.format(
+                size, '-rotated' if rotated else '')
+            path = os.path.join(directory, name + '.json')
+            with open(path, 'w') as fp:
+                json.dump(synthetic_layout(size, rotated), fp)
+            yield name, path
+
+
+def run_stages(file_name):
+    # Each stage in pipeline order, as (stage, seconds, API calls)
+    import adsk.core
+    import adsk.fusion
+    from .. import KLE
+    from .. import Layers
+    from .. import Sketches
+    from .. import Switches
+    timings = []
+
+    def stage(name, func, *args):
+        calls = sum(Standin.calls.values())
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append((name, time.perf_counter() - start,
+                        sum(Standin.calls.values()) - calls))
+        return result
+
+    keys = stage('get_keys', KLE.get_keys, file_name)
+    # The same layout again from a warm cache
+    Config.USE_CACHE = True
+    KLE.get_keys(file_name)
+    stage('get_keys_cached', KLE.get_keys, file_name)
+    Config.USE_CACHE = False
+    stage('convex_hull', lambda: Geometry.convex_hull(
+        Layout.points(Layout.bezel_cutouts(keys))))
+    stage('bezel_regions', Layout.bezel_regions, keys)
+    stage('mounting', Mounting.mounting, keys)
+    bezel = stage('bezel_cutout', Sketches.bezel_cutout, keys)
+    hull = stage('bezel_hull', Sketches.bezel_hull, keys)
+    outline = stage('outline', Sketches.outline, keys, Config.OUTLINE_OFFSET)
+    switches = stage('switch_cutouts', Sketches.switch_cutouts, keys)
+    outline_profiles = Layers.profile_collection(outline)
+    design = adsk.fusion.Design.cast(adsk.core.Application.get().activeProduct)
+    extrudes = design.rootComponent.features.extrudeFeatures
+    stage('extrude_layer', lambda: [
+        Layers.extrude_layer(extrudes, outline_profiles,
+                             Layers.profile_collection(cutout), 0, 0.3)
+        for cutout in (bezel, hull, switches)])
+    stage('full_case', Layers.full_case, keys)
+    stage('place_switches', Switches.place_switches, keys)
+    return len(keys), timings
+
+
+def run(files, sizes=SIZES, repeat=1):
+    """Best of `repeat` runs for every stage of every layout, and the hits
+    and misses of the layout cache"""
+    Standin.install()
+    previous = Config.USE_CACHE, Config.SWITCH_FILE, Config.CACHE_DIR
+    Config.USE_CACHE = False
+    Config.SWITCH_FILE = Config.SWITCH_FILE or Standin.switch_file()
+    try:
+        with tempfile.TemporaryDirectory(prefix='keebgen-bench-') as tmp:
+            # A cache of its own, so the cached stage starts cold
+            Config.CACHE_DIR = os.path.join(tmp, 'cache')
+            results = run_layouts(layouts(files, sizes, tmp), repeat)
+            cache = Cache.get_cache().stats()
+    finally:
+        Config.USE_CACHE, Config.SWITCH_FILE, Config.CACHE_DIR = previous
+    return results, cache
+
+
+def run_layouts(layouts, repeat):
+    results = []
+    for name, path in layouts:
+        best = {}
+        for _ in range(repeat):
+            Standin.reset()
+            count, timings = run_stages(path)
+            for stage, seconds, calls in timings:
+                if stage not in best or seconds < best[stage][0]:
+                    best[stage] = (seconds, calls)
+        for stage, (seconds, calls) in best.items():
+            results.append(dict(layout=name, keys=count, stage=stage,
+                                seconds=seconds, api_calls=calls))
+    return results
+
+
+def write_json(results, file_name):
+    with open(file_name, 'w') as fp:
+        json.dump(dict(created=time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       results=results), fp, indent=2)
+
+
+def write_csv(results, file_name):
+    with open(file_name, 'w', newline='') as fp:
+        writer = csv.DictWriter(
+            fp, ['layout', 'keys', 'stage', 'seconds', 'api_calls'])
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main(argv):
+    from .. import Harness
+    files = []
+    sizes = SIZES
+    repeat = 1
+    json_file = csv_file = None
+    args = iter(argv)
+    for arg in args:
+        if arg == '--sizes':
+            sizes = [int(size) for size in next(args).split(',') if size]
+        elif arg == '--repeat':
+            repeat = int(next(args))
+        elif arg == '--json':
+            json_file = next(args)
+        elif arg == '--csv':
+            csv_file = next(args)
+        else:
+            files.append(arg)
+    results, cache = run(files or Harness.sample_layouts(), sizes, repeat)
+    if json_file:
+        write_json(results, json_file)
+    if csv_file:
+        write_csv(results, csv_file)
+    for result in results:
+        print('{layout:32} {keys:5} {stage:20} {seconds:9.4f}s '
+              '{api_calls:7} calls'.format(**result))
+    print(Cache.describe(cache))
+    return 0
@@ -0,0 +1,172 @@
+import array
+import hashlib
+import json
+import os
+import struct
+import sys
+from .. import Config
+
+
+# Bump whenever the parsed/normalized key table changes shape or meaning,
+# so stale entries are never read back
+VERSION = 4
+MAGIC = b'KGC2'
+
+
+class LayoutCache:
+    """On-disk cache of normalized key tables, one columnar file per layout
+
+    Entries are read back as the (columns, meta) to build a KLE.KeyTable"""
+
+    def __init__(self, directory, max_entries):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def digest(self, fp, chunk_size=1 << 16):
+        # Content hash of the open KLE file, read a chunk at a time, plus
+        # every config value the normalized keys depend on
+        h = hashlib.sha256()
+        for chunk in iter(lambda: fp.read(chunk_size), b''):
+            h.update(chunk)
+        h.update(repr((VERSION, Config.KEY_UNIT)).encode())
+        return h.hexdigest()
+
+    def path(self, digest):
+        return os.path.join(self.directory, digest + '.keys')
+
+    def load(self, digest):
+        path = self.path(digest)
+        try:
+            with open(path, 'rb') as fp:
+                data = fp.read()
+        except OSError:
+            self.misses += 1
+            return None
+        keys = decode(data)
+        if keys is None:
+            self.misses += 1
+            return None
+        # Touch the entry so eviction is least recently used. Another
+        # process sharing the cache may have just evicted it.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return keys
+
+    def store(self, digest, keys):
+        path = self.path(digest)
+        # Processes sharing the cache each write their own temporary file
+        tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, 'wb') as fp:
+                fp.write(encode(keys))
+            os.replace(tmp_path, path)
+            self.evict()
+        except OSError:
+            # A read-only or full cache only costs the next run a parse
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def evict(self):
+        # Several processes may evict at once, so entries can disappear at
+        # any point. Whoever gets there first removes them.
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.keys'):
+                path = os.path.join(self.directory, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for mtime, path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses)
+
+
+def encode(keys):
+    # A JSON header naming the columns (plus the KLE metadata), then one
+    # little-endian float64 column per field
+    columns = keys.columns()
+    header = json.dumps(dict(count=len(keys), fields=list(columns),
+                             meta=keys.meta)).encode('utf-8')
+    parts = [MAGIC, struct.pack('<I', len(header)), header]
+    for column in columns.values():
+        column = array.array('d', column)
+        if sys.byteorder == 'big':
+            column.byteswap()
+        parts.append(column.tobytes())
+    return b''.join(parts)
+
+
+def decode(data):
+    # Returns (columns, meta), or None for anything unreadable
+    if data[:4] != MAGIC or len(data) < 8:
+        return None
+    header_len, = struct.unpack_from('<I', data, 4)
+    start = 8 + header_len
+    try:
+        header = json.loads(data[8:start].decode('utf-8'))
+        count = header['count']
+        size = start + 8 * count * len(header['fields'])
+    except (ValueError, TypeError, KeyError):
+        return None
+    if len(data) != size:
+        return None
+    columns = {}
+    for field in header['fields']:
+        column = array.array('d')
+        column.frombytes(data[start:start + 8 * count])
+        if sys.byteorder == 'big':
+            column.byteswap()
+        columns[field] = column
+        start += 8 * count
+    return columns, header['meta']
+
+
+_cache = None
+
+
+def cache_dir():
+    return Config.CACHE_DIR or os.path.join(
+        os.path.expanduser('~'), '.keebgen', 'cache')
+
+
+def get_cache():
+    # Shared per-session cache, created on first use
+    global _cache
+    directory = cache_dir()
+    if _cache is None or _cache.directory != directory:
+        _cache = LayoutCache(directory, Config.CACHE_SIZE)
+    _cache.max_entries = Config.CACHE_SIZE
+    return _cache
+
+
+def stats():
+    # Hits and misses of the session cache so far, none while it is off
+    if not Config.USE_CACHE:
+        return dict(hits=0, misses=0)
+    return get_cache().stats()
+
+
+def stats_since(before):
+    return {name: count - before[name] for name, count in stats().items()}
+
+
+def describe(stats):
+    return 'Layout cache: {} hit(s), {} miss(es)'.format(
+        stats['hits'], stats['misses'])
@@ -2,6 +2,11 @@
 KEY_UNIT = 1.905
 # and 1.4 cm plate cutout
 SWITCH_DIAMETER = 1.4
+# Plate switch cutouts: 'mx' (SWITCH_DIAMETER square), 'alps' or 'choc'.
+# If None, the layout's switch type (see SWITCH_TYPE) picks them.
+SWITCH_CUTOUT = None
+# Plate stabilizer cutouts on keys 2u and longer: 'cherry', 'costar' or None
+STABILIZERS = 'cherry'
 # plate config
 PLATE_THICKNESS = 0.3
 # bezel config
@@ -12,11 +17,81 @@ MID_THICKNESS_0 = 0.3
 MID_THICKNESS_1 = 0.3
 # bottom layer config
 BOTTOM_THICKNESS = 0.3
+# Layers of the case from the top down, as (name, thickness, cutout) with
+# cutout one of 'bezel', 'hull', 'switches' or None for a solid layer, e.g.
+# [('bezel', 0.3, 'bezel'), ('plate', 0.15, 'switches'),
+#  ('mid_0', 0.3, 'hull'), ('mid_1', 0.3, 'hull'), ('bottom', 0.2, None)]
+# If None, the six layers above
+LAYER_STACK = None
 # Distance from key 1.905 box to inner edge of bezel
 BEZEL_KEY_BUFFER = 0.0475
+# Distance from the bezel hull to the outer edge of the case
+OUTLINE_OFFSET = 1
+# Screw holes through every layer, spread around the margin between the
+# bezel hull and the outer edge of the case. 0 for none.
+SCREW_HOLES = 0
+# 2.2 mm clears an M2 screw
+SCREW_DIAMETER = 0.22
+# Least acrylic left between a screw hole and the hull, the case edge, the
+# USB cutout or another hole
+SCREW_CLEARANCE = 0.1
+# USB cutout through the top edge of the case, centered this many key
+# units from the left edge of the leftmost key, or 'center'. None for no
+# cutout.
+USB_POSITION = None
+USB_WIDTH = 1.2
+# Layers the USB cutout goes through, if None every layer with the 'hull'
+# cutout
+USB_LAYERS = None
+# Check the layout for overlapping keys and switch cutouts closer than
+# MIN_WEB_THICKNESS before building anything
+VALIDATE = True
+MIN_WEB_THICKNESS = 0.1
+
+# Cache parsed layouts on disk, keyed by file contents and KEY_UNIT
+USE_CACHE = True
+# Cache directory, if None it is ~/.keebgen/cache
+CACHE_DIR = None
+# Least recently used layouts are evicted past this many entries
+CACHE_SIZE = 256
 
 # Some optional features
 # Prompt for a switch model and insert it
 INSERT_SWITCHES = False
-# Export the acrylic layers to DXF (coming soon!)
-# EXPORT_DXFS = False
+# Switch STEP file to insert, if None you will be prompted for one
+SWITCH_FILE = None
+# Switch models by type. A layout picks its type with "switchMount" in its
+# KLE keyboard metadata ("cherry" is 'mx', "alps" is 'alps', 'choc' can be
+# given by name), falling back to SWITCH_TYPE. file is the model's STEP
+# file (SWITCH_FILE if None), offset is the model origin relative to the
+# key center and height how far above the plate the origin sits. Both
+# depend on where the STEP file puts its origin, so add 'alps' or 'choc'
+# entries to match the models you use. Inserting switches for a type
+# without a model is an error.
+SWITCH_TYPE = 'mx'
+SWITCH_MODELS = {
+    'mx': dict(file=None, offset=0.7375, height=0.1),
+}
+# Rerunning on a design KeebGen already built updates it in place: layers
+# whose sketches are unchanged keep their extrusions, with thicknesses
+# edited, and only the layers whose sketches changed are rebuilt
+INCREMENTAL = False
+# Insert a keycap on every key, from a directory of keycap models (see
+# Modules/Keycaps for how they are named)
+INSERT_KEYCAPS = False
+# Keycap models directory, if None you will be prompted for one
+KEYCAP_DIR = None
+# Height of the keycap bottoms above the plate
+KEYCAP_HEIGHT = 0.7
+# Build every KLE file in a directory (or JSON manifest) without prompting,
+# each into its own design
+BATCH_SOURCE = None
+# Record per-stage timings and API work, shown at the end of the run and
+# written as a Chrome trace file
+TRACE = False
+# Trace file, if None it goes next to the KLE file
+TRACE_FILE = None
+# Export the acrylic layers to DXF and SVG cut files
+EXPORT_DXFS = False
+# Directory for the cut files, if None they go next to the KLE file
+EXPORT_DIR = None
@@ -0,0 +1,72 @@
+import functools
+from .. import Config
+
+
+# Plate cutout templates. Each switch hole and stabilizer pair is computed
+# once, as polygons around the key center, and every key using it gets a
+# transformed copy (see Layout.instances).
+
+# Switch hole (width, height) per switch cutout style, None for the
+# SWITCH_DIAMETER square
+SWITCH_HOLES = {'mx': None, 'alps': (1.55, 1.28), 'choc': (1.38, 1.38)}
+# Stabilizer slot (width, height) per stabilizer type, and how far the
+# slot center sits below the switch center
+STABILIZER_SLOTS = {'cherry': (0.665, 1.23, 0.06),
+                    'costar': (0.33, 1.4, 0.05)}
+# Distance from the switch center to each slot center, by key length in
+# units. Keys between sizes use the next size down.
+STABILIZER_SIZES = ((2, 1.1938), (2.25, 1.1938), (2.75, 1.1938),
+                    (3, 1.905), (6, 4.7625), (6.25, 5.0), (7, 5.715),
+                    (8, 6.6675))
+
+
+def switch_hole(style):
+    if style not in SWITCH_HOLES:
+        raise ValueError('Unknown switch cutout style {!r}, expected one '
+                         'of {}'.format(style, ', '.join(SWITCH_HOLES)))
+    return _switch_hole(style, Config.SWITCH_DIAMETER)
+
+
+@functools.lru_cache(maxsize=None)
+def _switch_hole(style, diameter):
+    width, height = SWITCH_HOLES[style] or (diameter, diameter)
+    return (rectangle(0, 0, width, height),)
+
+
+def stabilizer(width, height, kind=None):
+    # The stabilizer slots for a key of this size, () if it needs none
+    kind = Config.STABILIZERS if kind is None else kind
+    if not kind:
+        return ()
+    if kind not in STABILIZER_SLOTS:
+        raise ValueError('Unknown stabilizer type {!r}, expected one of '
+                         '{}'.format(kind, ', '.join(STABILIZER_SLOTS)))
+    # Vertical keys (numpad + and enter) get their slots turned a quarter
+    # turn
+    vertical = height > width
+    length = max(width, height) / Config.KEY_UNIT
+    sizes = [units for units, spacing in STABILIZER_SIZES
+             if units <= length + 1e-6]
+    if not sizes:
+        return ()
+    return _stabilizer(kind, sizes[-1], vertical)
+
+
+@functools.lru_cache(maxsize=None)
+def _stabilizer(kind, size, vertical):
+    spacing = dict(STABILIZER_SIZES)[size]
+    width, height, drop = STABILIZER_SLOTS[kind]
+    slots = []
+    for cx in (-spacing, spacing):
+        slot = rectangle(cx, -drop, width, height)
+        if vertical:
+            # A quarter turn counter-clockwise keeps the winding
+            slot = tuple((-y, x) for x, y in slot)
+        slots.append(slot)
+    return tuple(slots)
+
+
+def rectangle(cx, cy, width, height):
+    x0, x1 = cx - width / 2, cx + width / 2
+    y0, y1 = cy - height / 2, cy + height / 2
+    return ((x0, y0), (x1, y0), (x1, y1), (x0, y1))
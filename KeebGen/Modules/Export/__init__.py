@@ -0,0 +1,210 @@
+import concurrent.futures
+import math
+import os
+import time
+import traceback
+from .. import Config
+from .. import Geometry
+from .. import Layout
+from .. import Mounting
+from .. import Stack
+
+
+# Fusion works in cm, cut files are written in mm
+SCALE = 10
+
+
+def layer_geometry(keys):
+    # Everything the layers are made of, computed once for the whole stack
+    bezel = Layout.bezel_cutouts(keys)
+    hull = Geometry.convex_hull(Layout.points(bezel))
+    mounting = Mounting.mounting(keys, hull)
+    return dict(
+        outline=Geometry.offset_convex(hull, Config.OUTLINE_OFFSET),
+        bounds=Geometry.bounds(hull),
+        hull=[hull],
+        bezel=Layout.bezel_regions(keys),
+        switches=Layout.plate_cutouts(keys),
+        screw_holes=mounting['screw_holes'],
+        usb=[mounting['usb']] if mounting['usb'] else [],
+    )
+
+
+def layer_entities(geometry, cutout, usb=False):
+    # Stream the outline segments, then the cutout loops as line segments,
+    # then the screw holes and the USB cutout
+    for segment in geometry['outline']:
+        yield segment
+    polygons = list(geometry.get(cutout) or [])
+    if usb:
+        polygons.extend(geometry['usb'])
+    for polygon in polygons:
+        for i in range(len(polygon)):
+            yield ('line', polygon[i], polygon[(i + 1) % len(polygon)])
+    for center in geometry['screw_holes']:
+        yield ('circle', center, Config.SCREW_DIAMETER / 2)
+
+
+def export_layout(keys, out_dir, name, formats=('dxf', 'svg')):
+    """Write one cut file per layer and format, returns the written paths"""
+    geometry = layer_geometry(keys)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    # One file set per layer of the same stack Layers.full_case builds
+    layers = Stack.layers()
+    usb_layers = Mounting.usb_layers(layers)
+    for layer in layers:
+        layer, cutout = layer['name'], layer['cutout']
+        for fmt in formats:
+            path = os.path.join(out_dir, '{}-{}.{}'.format(name, layer, fmt))
+            with open(path, 'w', encoding='utf-8') as fp:
+                writer = WRITERS[fmt](fp, geometry['bounds'], layer)
+                for entity in layer_entities(geometry, cutout,
+                                             layer in usb_layers):
+                    writer.write(entity)
+                writer.close()
+            paths.append(path)
+    return paths
+
+
+def export_file(file_name, out_dir, formats=('dxf', 'svg')):
+    from .. import KLE
+    from .. import Validate
+    name = os.path.splitext(os.path.basename(file_name))[0]
+    keys = KLE.get_keys(file_name)
+    if Config.VALIDATE:
+        Validate.validate(keys)
+    return export_layout(keys, out_dir, name, formats)
+
+
+def expand(paths):
+    # Directories stand for every KLE JSON file in them
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, name)
+                                for name in os.listdir(path)
+                                if name.lower().endswith('.json')))
+        else:
+            files.append(path)
+    return files
+
+
+def export_files(files, out_dir, formats=('dxf', 'svg'), workers=None):
+    """Export many layouts on a process pool, results in input order"""
+    start = time.perf_counter()
+    jobs = [(file_name, out_dir, formats) for file_name in files]
+    if workers == 1 or len(jobs) < 2:
+        results = [export_job(job) for job in jobs]
+    else:
+        # Workers may be fresh interpreters, so they get this process's
+        # config rather than the defaults
+        settings = {name: getattr(Config, name) for name in dir(Config)
+                    if name.isupper()}
+        workers = workers or os.cpu_count() or 1
+        with concurrent.futures.ProcessPoolExecutor(
+                workers, initializer=configure,
+                initargs=(settings,)) as pool:
+            results = list(pool.map(
+                export_job, jobs,
+                chunksize=max(1, len(jobs) // (workers * 4))))
+    return results, time.perf_counter() - start
+
+
+def configure(settings):
+    for name, value in settings.items():
+        setattr(Config, name, value)
+
+
+def export_job(job):
+    # One layout, run in a worker. Failures are reported, not raised, so
+    # one bad file doesn't stop the sweep.
+    file_name, out_dir, formats = job
+    start = time.perf_counter()
+    paths = []
+    error = None
+    try:
+        paths = export_file(file_name, out_dir, formats)
+    except Exception:
+        error = traceback.format_exc()
+    return dict(file=file_name, paths=paths, error=error,
+                seconds=time.perf_counter() - start)
+
+
+def fmt(value):
+    return '{:.6f}'.format(value * SCALE)
+
+
+class DxfWriter:
+    """Minimal R12 DXF, one LINE, ARC or CIRCLE entity per segment"""
+
+    def __init__(self, fp, bounds, layer):
+        self.fp = fp
+        self.layer = layer
+        fp.write('0\nSECTION\n2\nHEADER\n9\n$INSUNITS\n70\n4\n0\nENDSEC\n')
+        fp.write('0\nSECTION\n2\nENTITIES\n')
+
+    def write(self, entity):
+        if entity[0] == 'line':
+            _, (x0, y0), (x1, y1) = entity
+            self.fp.write('0\nLINE\n8\n{}\n10\n{}\n20\n{}\n11\n{}\n21\n{}\n'
+                          .format(self.layer, fmt(x0), fmt(y0),
+                                  fmt(x1), fmt(y1)))
+        elif entity[0] == 'circle':
+            _, (cx, cy), radius = entity
+            self.fp.write('0\nCIRCLE\n8\n{}\n10\n{}\n20\n{}\n40\n{}\n'
+                          .format(self.layer, fmt(cx), fmt(cy), fmt(radius)))
+        else:
+            _, (cx, cy), radius, start, end = entity
+            self.fp.write('0\nARC\n8\n{}\n10\n{}\n20\n{}\n40\n{}\n'
+                          '50\n{:.6f}\n51\n{:.6f}\n'
+                          .format(self.layer, fmt(cx), fmt(cy), fmt(radius),
+                                  math.degrees(start) % 360,
+                                  math.degrees(end) % 360))
+
+    def close(self):
+        self.fp.write('0\nENDSEC\n0\nEOF\n')
+
+
+class SvgWriter:
+    """SVG in mm with y flipped, one element per segment"""
+
+    def __init__(self, fp, bounds, layer):
+        self.fp = fp
+        margin = Config.OUTLINE_OFFSET
+        x0, y0, x1, y1 = bounds
+        width = fmt(x1 - x0 + 2 * margin)
+        height = fmt(y1 - y0 + 2 * margin)
+        fp.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        fp.write('<svg xmlns="http://www.w3.org/2000/svg" '
+                 'width="{0}mm" height="{1}mm" viewBox="{2} {3} {0} {1}">\n'
+                 .format(width, height, fmt(x0 - margin), fmt(-y1 - margin)))
+        fp.write('<g id="{}" fill="none" stroke="black" '
+                 'stroke-width="0.1">\n'.format(layer))
+
+    def write(self, entity):
+        if entity[0] == 'line':
+            _, (x0, y0), (x1, y1) = entity
+            self.fp.write('<path d="M {} {} L {} {}"/>\n'.format(
+                fmt(x0), fmt(-y0), fmt(x1), fmt(-y1)))
+        elif entity[0] == 'circle':
+            _, (cx, cy), radius = entity
+            self.fp.write('<circle cx="{}" cy="{}" r="{}"/>\n'.format(
+                fmt(cx), fmt(-cy), fmt(radius)))
+        else:
+            _, (cx, cy), radius, start, end = entity
+            # Counter-clockwise with y up is sweep-flag 0 once y is flipped
+            large = 1 if end - start > math.pi else 0
+            self.fp.write('<path d="M {} {} A {r} {r} 0 {} 0 {} {}"/>\n'
+                          .format(fmt(cx + radius * math.cos(start)),
+                                  fmt(-(cy + radius * math.sin(start))),
+                                  large,
+                                  fmt(cx + radius * math.cos(end)),
+                                  fmt(-(cy + radius * math.sin(end))),
+                                  r=fmt(radius)))
+
+    def close(self):
+        self.fp.write('</g>\n</svg>\n')
+
+
+WRITERS = dict(dxf=DxfWriter, svg=SvgWriter)
@@ -0,0 +1,34 @@
+import sys
+from . import expand, export_files
+
+
+# Usage, from the repository root:
+#   python -m KeebGen.Modules.Export [--workers N] [--formats dxf,svg]
+#       layout.json|layout_dir [...] out_dir
+# Layouts are spread over N processes (one per core by default).
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    workers = None
+    formats = ('dxf', 'svg')
+    paths = []
+    while args:
+        arg = args.pop(0)
+        if arg == '--workers':
+            workers = int(args.pop(0))
+        elif arg == '--formats':
+            formats = tuple(args.pop(0).split(','))
+        else:
+            paths.append(arg)
+    results, seconds = export_files(expand(paths[:-1]), paths[-1], formats,
+                                    workers)
+    failed = 0
+    for result in results:
+        if result['error']:
+            failed += 1
+            print('{} failed:\n{}'.format(result['file'], result['error']))
+        for path in result['paths']:
+            print(path)
+    print('{} layouts in {:.2f}s ({:.1f} layouts/sec), {} failed'.format(
+        len(results), seconds, len(results) / seconds if seconds else 0,
+        failed))
+    sys.exit(1 if failed else 0)
@@ -1,52 +1,302 @@
-import adsk.core
-
-
-def cross(u, v):
-    # Compute cross-product of two vectors
-    return adsk.core.Vector3D.create(
-        u.y * v.z - u.z * v.y,
-        u.z * v.x - u.x * v.z,
-        u.x * v.y - u.y * v.x
-    )
-
-
-def split(u, v, points):
-    # return points on left side of UV
-    return [p for p in points if cross_mag(p, u, v) < 0]
-
-
-def cross_mag(p, u, v):
-    ui = adsk.core.Application.get().userInterface
-    uc = adsk.core.Vector3D.create(u.x, u.y, u.z)
-    pc = adsk.core.Vector3D.create(p.x, p.y, p.z)
-    vc = adsk.core.Vector3D.create(v.x, v.y, v.z)
-    try:
-        pc.subtract(uc)
-        vc.subtract(uc)
-    except TypeError as err:
-        ui.messageBox('pc:{}\nu:{}'.format(pc, uc))
-        raise TypeError
-    except AttributeError as err:
-        ui.messageBox('pc:{}\nu:{}'.format(pc, uc))
-        raise AttributeError
-    return cross(pc, vc).z
-
-
-def extend(u, v, points):
-    if not points:
-        return []
+import math
+
+
+# Tolerance used to treat nearly coincident or collinear points as exact
+EPSILON = 1e-9
 
-    # find furthest point W, and split search to WV, UW
-    w = min(points, key=lambda p: cross_mag(p, u, v))
-    p1, p2 = split(w, v, points), split(u, w, points)
-    return extend(w.asVector(), v, p1) + [w] + extend(u, w.asVector(), p2)
+
+def cross(o, a, b):
+    # z component of the cross product (a - o) x (b - o)
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
 
 
 def convex_hull(points):
-    # find two hull points, U, V, and split to left and right search
-    u = min(points, key=lambda p: p.x).asVector()
-    v = max(points, key=lambda p: p.x).asVector()
-    left, right = split(u, v, points), split(v, u, points)
+    # Monotone chain hull on plain (x, y) tuples. Duplicate and collinear
+    # points are dropped, so the result is the same for any input order.
+    # Returns the hull counter-clockwise, starting from the lowest-leftmost
+    # point, without repeating the first point at the end.
+    pts = sorted(set((round(p[0], 9), round(p[1], 9)) for p in points))
+    if len(pts) < 3:
+        return pts
+
+    lower = []
+    for p in pts:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= EPSILON:
+            lower.pop()
+        lower.append(p)
+    upper = []
+    for p in reversed(pts):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= EPSILON:
+            upper.pop()
+        upper.append(p)
+    return lower[:-1] + upper[:-1]
+
+
+def offset_convex(polygon, distance):
+    # Offset a counter-clockwise convex polygon outwards. Edges are pushed
+    # out along their normals and joined by arcs around the original
+    # corners, the same shape a sketch offset produces. Returns a closed
+    # sequence of ('line', start, end) and
+    # ('arc', center, radius, start_angle, end_angle) segments, with arcs
+    # running counter-clockwise and angles in radians.
+    count = len(polygon)
+    normals = []
+    for i in range(count):
+        x0, y0 = polygon[i]
+        x1, y1 = polygon[(i + 1) % count]
+        length = math.hypot(x1 - x0, y1 - y0)
+        normals.append(((y1 - y0) / length, (x0 - x1) / length))
+
+    segments = []
+    for i in range(count):
+        x0, y0 = polygon[i]
+        x1, y1 = polygon[(i + 1) % count]
+        nx, ny = normals[i]
+        segments.append(('line',
+                         (x0 + nx * distance, y0 + ny * distance),
+                         (x1 + nx * distance, y1 + ny * distance)))
+        next_nx, next_ny = normals[(i + 1) % count]
+        start = math.atan2(ny, nx)
+        end = math.atan2(next_ny, next_nx)
+        if end < start:
+            end += 2 * math.pi
+        segments.append(('arc', (x1, y1), distance, start, end))
+    return segments
+
+
+def sample(segments, step):
+    # Points spaced about step apart along offset_convex style segments
+    points = []
+    for segment in segments:
+        if segment[0] == 'line':
+            _, (x0, y0), (x1, y1) = segment
+            count = max(1, int(math.hypot(x1 - x0, y1 - y0) / step))
+            points.extend((x0 + (x1 - x0) * i / count,
+                           y0 + (y1 - y0) * i / count)
+                          for i in range(count))
+        else:
+            _, (cx, cy), radius, start, end = segment
+            count = max(1, int(radius * (end - start) / step))
+            for i in range(count):
+                angle = start + (end - start) * i / count
+                points.append((cx + radius * math.cos(angle),
+                               cy + radius * math.sin(angle)))
+    return points
+
+
+def area(polygon):
+    # Signed area, positive for counter-clockwise polygons
+    return sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1)
+               in zip(polygon, polygon[1:] + polygon[:1])) / 2
+
+
+def contains(polygon, x, y):
+    # Even-odd point in polygon test
+    inside = False
+    x0, y0 = polygon[-1]
+    for x1, y1 in polygon:
+        if (y0 > y) != (y1 > y) and \
+                x < x0 + (y - y0) * (x1 - x0) / (y1 - y0):
+            inside = not inside
+        x0, y0 = x1, y1
+    return inside
+
+
+def segment_params(p0, p1, q0, q1):
+    # Parameters along p0-p1 where it meets q0-q1, overlapping collinear
+    # segments give the ends of the overlap
+    rx, ry = p1[0] - p0[0], p1[1] - p0[1]
+    sx, sy = q1[0] - q0[0], q1[1] - q0[1]
+    qx, qy = q0[0] - p0[0], q0[1] - p0[1]
+    denom = rx * sy - ry * sx
+    length = rx * rx + ry * ry
+    if abs(denom) <= EPSILON * length:
+        if abs(qx * ry - qy * rx) > EPSILON * length:
+            return []
+        ts = [(qx * rx + qy * ry) / length,
+              ((q1[0] - p0[0]) * rx + (q1[1] - p0[1]) * ry) / length]
+        return [t for t in ts if 0 < t < 1]
+    t = (qx * sy - qy * sx) / denom
+    u = (qx * ry - qy * rx) / denom
+    if -EPSILON <= u <= 1 + EPSILON and 0 < t < 1:
+        return [t]
+    return []
+
+
+class GridIndex:
+    """Buckets bounding boxes into a uniform grid for neighbour queries"""
+
+    def __init__(self, boxes):
+        self.boxes = boxes
+        sizes = sorted(max(b[2] - b[0], b[3] - b[1]) for b in boxes)
+        self.cell = max(sizes[len(sizes) // 2], EPSILON) if sizes else 1
+        self.cells = {}
+        for i, box in enumerate(boxes):
+            for cell in self.cover(box):
+                self.cells.setdefault(cell, []).append(i)
+
+    def cover(self, box):
+        x0, y0, x1, y1 = (int(math.floor(v / self.cell)) for v in box)
+        return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+    def query(self, box):
+        # Indexes of every box overlapping box
+        found = set()
+        for cell in self.cover(box):
+            found.update(self.cells.get(cell, ()))
+        return sorted(i for i in found
+                      if self.boxes[i][0] <= box[2] + EPSILON and
+                      box[0] <= self.boxes[i][2] + EPSILON and
+                      self.boxes[i][1] <= box[3] + EPSILON and
+                      box[1] <= self.boxes[i][3] + EPSILON)
+
+
+class PointSnap:
+    """Merges points closer than the tolerance into one vertex"""
+
+    def __init__(self, tolerance=1e-7):
+        self.tolerance = tolerance
+        self.cells = {}
+
+    def __call__(self, point):
+        cx = int(math.floor(point[0] / self.tolerance))
+        cy = int(math.floor(point[1] / self.tolerance))
+        for x in (cx - 1, cx, cx + 1):
+            for y in (cy - 1, cy, cy + 1):
+                for other in self.cells.get((x, y), ()):
+                    if abs(other[0] - point[0]) <= self.tolerance and \
+                            abs(other[1] - point[1]) <= self.tolerance:
+                        return other
+        self.cells.setdefault((cx, cy), []).append(point)
+        return point
+
+
+def union(polygons, probe=1e-6):
+    # Union of simple polygons. Every edge is split where it crosses or
+    # overlaps another polygon's edges, and a piece is kept when just
+    # outside of it (to its right, once the polygon runs counter-clockwise)
+    # isn't covered by any other polygon. Touching and overlapping
+    # polygons merge into one loop. Returns the boundary loops, outer
+    # loops counter-clockwise and holes clockwise, with no collinear
+    # points.
+    polygons = [list(p) if area(p) > 0 else list(reversed(p))
+                for p in polygons if len(p) >= 3]
+    if not polygons:
+        return []
+    boxes = [bounds(p) for p in polygons]
+    index = GridIndex(boxes)
+    snap = PointSnap()
+    edges = {}
+    for i, polygon in enumerate(polygons):
+        others = [j for j in index.query(boxes[i]) if j != i]
+        for k in range(len(polygon)):
+            p0 = polygon[k]
+            p1 = polygon[(k + 1) % len(polygon)]
+            ts = [0, 1]
+            for j in others:
+                other = polygons[j]
+                for m in range(len(other)):
+                    ts.extend(segment_params(p0, p1, other[m],
+                                             other[(m + 1) % len(other)]))
+            ts.sort()
+            length = math.hypot(p1[0] - p0[0], p1[1] - p0[1])
+            nx, ny = (p1[1] - p0[1]) / length, (p0[0] - p1[0]) / length
+            for t0, t1 in zip(ts, ts[1:]):
+                if (t1 - t0) * length <= EPSILON:
+                    continue
+                tm = (t0 + t1) / 2
+                x = p0[0] + (p1[0] - p0[0]) * tm + nx * probe
+                y = p0[1] + (p1[1] - p0[1]) * tm + ny * probe
+                if any(contains(polygons[j], x, y) for j in others):
+                    continue
+                a = snap((p0[0] + (p1[0] - p0[0]) * t0,
+                          p0[1] + (p1[1] - p0[1]) * t0))
+                b = snap((p0[0] + (p1[0] - p0[0]) * t1,
+                          p0[1] + (p1[1] - p0[1]) * t1))
+                if a != b:
+                    # Coincident pieces running the same way are kept once
+                    edges.setdefault(a, {})[b] = True
+    return chain_loops(edges)
+
+
+def union_rectangles(boxes):
+    # Union of axis aligned (x0, y0, x1, y1) boxes, much cheaper than the
+    # general union. The boxes are filled into a grid over their distinct
+    # coordinates and the loops are traced along the filled cells' edges,
+    # with the same orientation as union.
+    xs = sorted(set(round(v, 9) for box in boxes for v in (box[0], box[2])))
+    ys = sorted(set(round(v, 9) for box in boxes for v in (box[1], box[3])))
+    column = {x: i for i, x in enumerate(xs)}
+    row = {y: i for i, y in enumerate(ys)}
+    filled = set()
+    for x0, y0, x1, y1 in boxes:
+        for i in range(column[round(x0, 9)], column[round(x1, 9)]):
+            for j in range(row[round(y0, 9)], row[round(y1, 9)]):
+                filled.add((i, j))
+    edges = {}
+    for i, j in filled:
+        # Counter-clockwise around each cell, skipping shared sides
+        if (i, j - 1) not in filled:
+            edges.setdefault((xs[i], ys[j]), {})[(xs[i + 1], ys[j])] = True
+        if (i + 1, j) not in filled:
+            edges.setdefault((xs[i + 1], ys[j]), {})[
+                (xs[i + 1], ys[j + 1])] = True
+        if (i, j + 1) not in filled:
+            edges.setdefault((xs[i + 1], ys[j + 1]), {})[
+                (xs[i], ys[j + 1])] = True
+        if (i - 1, j) not in filled:
+            edges.setdefault((xs[i], ys[j + 1]), {})[(xs[i], ys[j])] = True
+    return chain_loops(edges)
+
+
+def chain_loops(edges):
+    # Walk directed edges {start: {end: True}} into closed loops. Where
+    # loops touch at a corner, the sharpest left turn is taken so they
+    # stay separate.
+    loops = []
+    while edges:
+        start = min(edges)
+        loop = [start]
+        current = start
+        previous = None
+        while True:
+            ends = edges[current]
+            if previous is None or len(ends) == 1:
+                end = next(iter(ends))
+            else:
+                dx, dy = current[0] - previous[0], current[1] - previous[1]
+                end = max(ends, key=lambda e: math.atan2(
+                    dx * (e[1] - current[1]) - dy * (e[0] - current[0]),
+                    dx * (e[0] - current[0]) + dy * (e[1] - current[1])))
+            del ends[end]
+            if not ends:
+                del edges[current]
+            if end == start:
+                break
+            if end not in edges:
+                # Open chain, only possible from degenerate input
+                loop = None
+                break
+            loop.append(end)
+            previous, current = current, end
+        if loop and len(loop) >= 3:
+            loops.append(simplify(loop))
+    return [loop for loop in loops if len(loop) >= 3]
+
+
+def simplify(loop):
+    # Drop points on a straight line between their neighbours
+    points = []
+    count = len(loop)
+    for i in range(count):
+        before, point, after = loop[i - 1], loop[i], loop[(i + 1) % count]
+        span = math.hypot(after[0] - before[0], after[1] - before[1])
+        if abs(cross(before, point, after)) > EPSILON * max(span, 1):
+            points.append(point)
+    return points
+
 
-    # find convex hull on each side
-    return [v] + extend(u, v, left) + [u] + extend(v, u, right) + [v]
+def bounds(points):
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return min(xs), min(ys), max(xs), max(ys)
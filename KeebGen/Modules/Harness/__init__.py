@@ -0,0 +1,154 @@
+import glob
+import json
+import os
+from .. import Config
+from .. import Standin
+
+
+# Runs KeebGen.main against the adsk stand-in, so layouts can be built and
+# checked on any machine. Run from the repository root:
+#   python -m KeebGen.Modules.Harness [layout.json ...] [--baseline file]
+#   [--write-baseline file]
+# With no layouts, every file in sample-data is built and checked against
+# the committed baseline (tests/harness-baseline.json), which the tests
+# also use. Rewrite it with --write-baseline when a change to the output
+# is intended.
+
+ROOT = os.path.join(os.path.dirname(__file__), '..', '..', '..')
+SAMPLE_DATA = os.path.join(ROOT, 'sample-data')
+BASELINE = os.path.join(ROOT, 'tests', 'harness-baseline.json')
+
+
+def sample_layouts():
+    return sorted(glob.glob(os.path.join(SAMPLE_DATA, '*.json')))
+
+
+def run_layout(file_name, insert_switches=False):
+    """Build one layout against the stand-in, returns what was made"""
+    Standin.install()
+    # main's Fusion stages import adsk when they run, so the stand-in has
+    # to be in place first
+    from ... import KeebGen
+    app = Standin.reset()
+    previous = (Config.INSERT_SWITCHES, Config.SWITCH_FILE,
+                Config.EXPORT_DXFS, Config.USE_CACHE)
+    Config.INSERT_SWITCHES = insert_switches
+    Config.SWITCH_FILE = Standin.switch_file()
+    Config.EXPORT_DXFS = False
+    # Always a fresh parse, so the parser is exercised too
+    Config.USE_CACHE = False
+    try:
+        KeebGen.main(file_name)
+    finally:
+        (Config.INSERT_SWITCHES, Config.SWITCH_FILE,
+         Config.EXPORT_DXFS, Config.USE_CACHE) = previous
+    return summarize(app)
+
+
+def summarize(app):
+    root = app.activeProduct.rootComponent
+    sketches = [dict(name=sketch.name,
+                     curves=sketch.sketchCurves.count,
+                     profiles=len(sketch.loops()),
+                     points=sketch_points(sketch))
+                for sketch in root.sketches]
+    bodies = []
+    for body in root.bRepBodies:
+        feature = body.feature
+        bodies.append(dict(
+            name=body.name,
+            elevation=feature.startExtent.offset.value,
+            thickness=feature.extentOne.distance.value,
+            profiles=feature.profile.count,
+            cut_profiles=[cut.profile.count for cut in body.cuts]))
+    return dict(calls=dict(Standin.calls), sketches=sketches, bodies=bodies,
+                occurrences=root.occurrences.count)
+
+
+def sketch_points(sketch):
+    # Every sketch point rounded to 0.01 mm, sorted so the order they were
+    # created in doesn't matter
+    return sorted('{:.3f} {:.3f}'.format(round(p.geometry.x, 3) + 0.0,
+                                         round(p.geometry.y, 3) + 0.0)
+                  for p in sketch.sketchPoints)
+
+
+def compare(result, baseline, tolerance=1e-6):
+    # Geometry must match the baseline, and no API call may happen more
+    # often than it used to
+    problems = []
+    for name, count in result['calls'].items():
+        if count > baseline['calls'].get(name, 0):
+            problems.append('{} called {} times, baseline {}'.format(
+                name, count, baseline['calls'].get(name, 0)))
+    if len(result['sketches']) != len(baseline['sketches']):
+        problems.append('{} sketches, baseline {}'.format(
+            len(result['sketches']), len(baseline['sketches'])))
+    for sketch, expected in zip(result['sketches'], baseline['sketches']):
+        if sketch['name'] != expected['name']:
+            problems.append('sketch {} is called {}'.format(
+                expected['name'], sketch['name']))
+        for field in ('curves', 'profiles'):
+            if sketch[field] != expected[field]:
+                problems.append('{} has {} {}, baseline {}'.format(
+                    expected['name'], sketch[field], field, expected[field]))
+        if sketch['points'] != expected['points']:
+            moved = set(sketch['points']) ^ set(expected['points'])
+            problems.append('{} points differ from the baseline, e.g. {}'
+                            .format(expected['name'], sorted(moved)[:3]))
+    if len(result['bodies']) != len(baseline['bodies']):
+        problems.append('{} bodies, baseline {}'.format(
+            len(result['bodies']), len(baseline['bodies'])))
+    for body, expected in zip(result['bodies'], baseline['bodies']):
+        for field in ('elevation', 'thickness'):
+            if abs(body[field] - expected[field]) > tolerance:
+                problems.append('{} {} is {}, baseline {}'.format(
+                    body['name'], field, body[field], expected[field]))
+        if body['name'] != expected['name']:
+            problems.append('body {} is called {}'.format(
+                expected['name'], body['name']))
+        for field in ('profiles', 'cut_profiles'):
+            if body[field] != expected[field]:
+                problems.append('{} {} is {}, baseline {}'.format(
+                    body['name'], field, body[field], expected[field]))
+    if result['occurrences'] != baseline['occurrences']:
+        problems.append('{} occurrences, baseline {}'.format(
+            result['occurrences'], baseline['occurrences']))
+    return problems
+
+
+def main(argv):
+    baseline_file = write_file = None
+    files = []
+    args = iter(argv)
+    for arg in args:
+        if arg == '--baseline':
+            baseline_file = next(args)
+        elif arg == '--write-baseline':
+            write_file = next(args)
+        else:
+            files.append(arg)
+    if not files and not write_file and baseline_file is None:
+        baseline_file = BASELINE
+    files = files or sample_layouts()
+
+    results = {os.path.basename(f): run_layout(f, insert_switches=True)
+               for f in files}
+    if write_file:
+        with open(write_file, 'w') as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+    failed = False
+    if baseline_file:
+        with open(baseline_file) as fp:
+            baseline = json.load(fp)
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            for problem in compare(result, baseline[name]):
+                failed = True
+                print('{}: {}'.format(name, problem))
+    for name, result in results.items():
+        print('{}: {} sketches, {} bodies, {} occurrences, {} API calls'
+              .format(name, len(result['sketches']), len(result['bodies']),
+                      result['occurrences'], sum(result['calls'].values())))
+    return 1 if failed else 0
@@ -1,40 +1,159 @@
+import array
+import codecs
+import hashlib
 import json
 import math
-from .. import ui_commands
+import re
+from .. import Cache
 from .. import Config
 
 
-def get_keys():
-    file_name = ui_commands.file_select(
-        'Select a JSON-serialized KLE file', '*.json')
+def select_file():
+    # Only needs Fusion when actually prompting
+    from .. import ui_commands
     try:
-        with open(file_name, 'r') as fp:
-            keys = deserialize(json.load(fp))
+        return ui_commands.file_select(
+            'Select a JSON-serialized KLE file', '*.json')
     except FileNotFoundError:
         return
 
-    keys = [offset_key(key) for key in keys]
-    keys = [scale_key(Config.KEY_UNIT, key) for key in keys]
+
+def get_keys(file_name=None):
+    # Without a file name, prompt for one
+    if file_name is None:
+        file_name = select_file()
+        if file_name is None:
+            return
+    with open(file_name, 'rb') as fp:
+        # Unchanged layouts skip parsing completely
+        if Config.USE_CACHE:
+            cache = Cache.get_cache()
+            digest = cache.digest(fp)
+            keys = cache.load(digest)
+            if keys is not None:
+                return KeyTable(*keys)
+            fp.seek(0)
+        keys = deserialize(iter_rows(fp))
+    keys.offset()
+    keys.scale(Config.KEY_UNIT)
+    if Config.USE_CACHE:
+        cache.store(digest, keys)
     return keys
 
 
-def offset_key(key):
-    new_key = key.copy()
-    new_key['x'] = new_key['x'] + new_key['width'] / 2
-    new_key['y'] = new_key['y'] + new_key['height'] / 2
-    return new_key
+# x2, y2, width2 and height2 describe the second rectangle of non
+# rectangular keys (ISO enter, stepped keys). Once normalized, x2 and y2 are
+# its center, like x and y are for the first rectangle. profile_row is the
+# keycap row from the key's KLE profile ("DCS R3" is 3), 0 if it has none.
+FIELDS = ('x', 'y', 'width', 'height',
+          'rotation_angle', 'rotation_x', 'rotation_y',
+          'x2', 'y2', 'width2', 'height2', 'profile_row')
+
+
+# KLE switchMount values, and switch types given by name, to switch types
+SWITCH_MOUNTS = {'cherry': 'mx', 'alps': 'alps', 'mx': 'mx', 'choc': 'choc'}
+
+
+def switch_type(keys):
+    # The layout's switch type from its metadata, or the default one
+    mount = str(keys.meta.get('switchMount', '')).lower()
+    return SWITCH_MOUNTS.get(mount, Config.SWITCH_TYPE)
+
+
+class KeyTable:
+    """Keys stored as parallel float arrays, one per field"""
+
+    def __init__(self, columns=None, meta=None):
+        for field in FIELDS:
+            setattr(self, field,
+                    array.array('d', columns[field] if columns else ()))
+        # The KLE keyboard metadata object, if the file has one
+        self.meta = meta or {}
+        self._clusters = None
+
+    def append(self, key):
+        for field in FIELDS:
+            getattr(self, field).append(key[field])
+        self._clusters = None
+
+    def __len__(self):
+        return len(self.x)
+
+    def columns(self):
+        return {field: getattr(self, field) for field in FIELDS}
+
+    def clusters(self):
+        """Keys grouped by the rotation they share, as Clusters"""
+        if self._clusters is None:
+            clusters = {}
+            for i, (ng, cx, cy) in enumerate(zip(
+                    self.rotation_angle, self.rotation_x, self.rotation_y)):
+                # The rotation point doesn't matter without an angle
+                rotation = (ng, cx, cy) if ng else (0, 0, 0)
+                if rotation not in clusters:
+                    clusters[rotation] = Cluster(*rotation)
+                clusters[rotation].keys.append(i)
+            self._clusters = list(clusters.values())
+        return self._clusters
 
+    def fingerprint(self):
+        # Changes whenever any key's geometry does
+        h = hashlib.sha1()
+        for field in FIELDS:
+            h.update(getattr(self, field).tobytes())
+        return h.hexdigest()
 
-def scale_key(scale, key):
-    key = key.copy()
-    key["x"] = scale * key["x"]
-    key["y"] = -scale * key["y"]
-    key["width"] = scale * key["width"]
-    key["height"] = scale * key["height"]
-    key['rotation_x'] = scale * key["rotation_x"]
-    key['rotation_y'] = -scale * key["rotation_y"]
-    key['rotation_angle'] = math.radians(-key["rotation_angle"])
-    return key
+    def offset(self):
+        # Move x, y from the top left corner to the center of each key, and
+        # x2, y2 from an offset to the center of the second rectangle
+        self.x2 = array.array('d', [x + x2 + w2 / 2 for x, x2, w2 in zip(
+            self.x, self.x2, self.width2)])
+        self.y2 = array.array('d', [y + y2 + h2 / 2 for y, y2, h2 in zip(
+            self.y, self.y2, self.height2)])
+        self.x = array.array('d', [x + w / 2
+                                   for x, w in zip(self.x, self.width)])
+        self.y = array.array('d', [y + h / 2
+                                   for y, h in zip(self.y, self.height)])
+        self._clusters = None
+
+    def scale(self, scale):
+        # From KLE units (y down, degrees clockwise) to model units
+        # (y up, radians counter-clockwise)
+        self.x = array.array('d', [scale * x for x in self.x])
+        self.y = array.array('d', [-scale * y for y in self.y])
+        self.width = array.array('d', [scale * w for w in self.width])
+        self.height = array.array('d', [scale * h for h in self.height])
+        self.x2 = array.array('d', [scale * x for x in self.x2])
+        self.y2 = array.array('d', [-scale * y for y in self.y2])
+        self.width2 = array.array('d', [scale * w for w in self.width2])
+        self.height2 = array.array('d', [scale * h for h in self.height2])
+        self.rotation_x = array.array(
+            'd', [scale * x for x in self.rotation_x])
+        self.rotation_y = array.array(
+            'd', [-scale * y for y in self.rotation_y])
+        self.rotation_angle = array.array(
+            'd', [math.radians(-ng) for ng in self.rotation_angle])
+        self._clusters = None
+
+
+class Cluster:
+    """Keys sharing one rotation, with its sine and cosine worked out once"""
+
+    def __init__(self, angle, x, y):
+        self.angle = angle
+        self.x = x
+        self.y = y
+        self.cos = math.cos(angle)
+        self.sin = math.sin(angle)
+        # Indices of the keys in the cluster, in table order
+        self.keys = []
+
+    def rotate_polygon(self, polygon):
+        if not self.angle:
+            return list(polygon)
+        cx, cy, c, s = self.x, self.y, self.cos, self.sin
+        return [(cx + (x - cx) * c - (y - cy) * s,
+                 cy + (x - cx) * s + (y - cy) * c) for x, y in polygon]
 
 
 class dotdict(dict):
@@ -44,44 +163,113 @@ class dotdict(dict):
     __delattr__ = dict.__delitem__
 
 
+def iter_rows(fp, chunk_size=1 << 16):
+    # Stream the elements of the top level JSON array one at a time from a
+    # binary file, decoding UTF-8 as it goes. Undecodable bytes in legends
+    # are replaced rather than failing the whole layout.
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+    buf = ''
+    opened = eof = False
+    while True:
+        buf = buf.lstrip()
+        if buf and not opened:
+            if buf[0] != '[':
+                raise ValueError('A KLE file must contain a JSON array')
+            buf = buf[1:]
+            opened = True
+            continue
+        if buf and buf[0] == ',':
+            buf = buf[1:]
+            continue
+        if buf and buf[0] == ']':
+            return
+        if buf:
+            try:
+                row, end = decoder.raw_decode(buf)
+            except ValueError:
+                # Most likely the row continues in the next chunk
+                if eof:
+                    raise
+            else:
+                yield row
+                buf = buf[end:]
+                continue
+        if eof:
+            raise ValueError('Unexpected end of KLE file')
+        chunk = fp.read(chunk_size)
+        eof = not chunk
+        buf += text.decode(chunk, final=eof)
+
+
 def deserialize(rows):
+    # Follows the KLE serialization format, see
+    # https://github.com/ijprest/kle-serial
     # Initialize with defaults
     current = dotdict(dict(
         x=0, y=0, width=1, height=1,                   # position, size
+        x2=0, y2=0, width2=0, height2=0,               # second rectangle
         rotation_angle=0, rotation_x=0, rotation_y=0,  # rotation
+        profile_row=0,                                 # keycap row
+        decal=False, ghost=False,
     ))
-    keys = []
+    keys = KeyTable()
     cluster = dotdict(dict(x=0, y=0))
     for r, row in enumerate(rows):
         if isinstance(row, list):
             for i, item in enumerate(row):
                 if isinstance(item, str):
-                    # Copy-construct the accumulated key
-                    keys.append(dotdict(current.copy()))
+                    # Decals and ghosted keys are only drawn by KLE, they
+                    # don't get a switch or a cutout
+                    if not (current.decal or current.ghost):
+                        add_key(keys, current)
                     # Set up for the next item
                     reset_current(current)
-                else:
+                elif isinstance(item, dict):
+                    if i != 0 and ('r' in item or 'rx' in item or
+                                   'ry' in item):
+                        raise ValueError(
+                            'Rotation can only be specified on the first '
+                            'key in a row (row {})'.format(r))
                     update_current_by_meta(
                         current, dotdict(item), cluster)
             # End of the row
             current.y += 1
-        current.x = current.rotation_x
+            current.x = current.rotation_x
+        elif isinstance(row, dict):
+            if r != 0:
+                raise ValueError(
+                    'Keyboard metadata must be the first element')
+            keys.meta = row
     return keys
 
 
+def add_key(keys, current):
+    key = current.copy()
+    # A missing second rectangle is the same as the first one
+    if not key['width2']:
+        key['width2'] = key['width']
+    if not key['height2']:
+        key['height2'] = key['height']
+    keys.append(key)
+
+
 def reset_current(current):
     current.x += current.width
     current.width = current.height = 1
+    current.x2 = current.y2 = current.width2 = current.height2 = 0
+    current.decal = False
 
 
 def update_current_by_meta(current, meta, cluster):
-    # Update rotation info
-    if meta.r:
+    # Update rotation info, rx and ry also reset the position to the
+    # rotation origin
+    if meta.r is not None:
         current.rotation_angle = meta.r
-    if meta.rx:
+    if meta.rx is not None:
         current.rotation_x = cluster.x = meta.rx
         current.update(cluster)
-    if meta.ry:
+    if meta.ry is not None:
         current.rotation_y = cluster.y = meta.ry
         current.update(cluster)
     # Increment next position values
@@ -89,6 +277,26 @@ def update_current_by_meta(current, meta, cluster):
     current.y += meta.get('y', 0)
     # Store next dimensions
     if meta.w:
-        current.width = meta.w
+        current.width = current.width2 = meta.w
     if meta.h:
-        current.height = meta.h
+        current.height = current.height2 = meta.h
+    if meta.x2:
+        current.x2 = meta.x2
+    if meta.y2:
+        current.y2 = meta.y2
+    if meta.w2:
+        current.width2 = meta.w2
+    if meta.h2:
+        current.height2 = meta.h2
+    if meta.p is not None:
+        current.profile_row = profile_row(meta.p)
+    # Key flags
+    if meta.d:
+        current.decal = meta.d
+    if meta.g is not None:
+        current.ghost = meta.g
+
+
+def profile_row(profile):
+    match = re.search(r'\bR(\d+)\b', str(profile), re.IGNORECASE)
+    return int(match.group(1)) if match else 0
@@ -0,0 +1,84 @@
+import os
+import adsk.core
+import adsk.fusion
+from .. import ui_commands
+from .. import Config
+from .. import Layout
+from .. import Library
+from .. import Stack
+from .. import Switches
+from .. import Trace
+
+
+# Keycap models are STEP files in one directory, named after the key size
+# and optionally the profile row: 1u.step, 2.25u.step, 1.25ux2u.step (width
+# by height) or 1u-r3.step for a row 3 cap. A key with a profile row uses
+# the row's model if there is one and the plain size otherwise. Models are
+# expected upright with their origin at the center of the cap's bottom.
+
+
+def place_keycaps(keys):
+    app = adsk.core.Application.get()
+    design = adsk.fusion.Design.cast(app.activeProduct)
+    rootComp = design.rootComponent
+
+    files = model_files(keys, keycap_dir())
+    # Every transform is computed up front from the key table
+    world = Layout.world_placements(keys, 0, 0)
+    height = Stack.plate_height(Stack.layers()) + Config.KEYCAP_HEIGHT
+    components = {}
+    for file_name, placement in zip(files, world):
+        transform = Switches.matrix(placement, height)
+        if file_name not in components:
+            # Each distinct model is imported once, all its other keys
+            # reuse the component
+            name = os.path.splitext(os.path.basename(file_name))[0]
+            component, occurrence = Library.get_component(
+                design, 'keycap-' + name.lower(), file_name)
+            components[file_name] = component
+            if occurrence is not None:
+                occurrence.transform = transform
+                continue
+        rootComp.occurrences.addExistingComponent(
+            components[file_name], transform)
+        Trace.count('occurrence')
+    return components
+
+
+def model_files(keys, directory):
+    # The model file for every key. Fails before anything is imported if
+    # any key has no model.
+    models = {}
+    for name in os.listdir(directory):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() in ('.step', '.stp'):
+            models[stem.lower()] = os.path.join(directory, name)
+    files = []
+    missing = []
+    for width, height, row in zip(keys.width, keys.height, keys.profile_row):
+        names = model_names(width, height, row)
+        found = [models[name] for name in names if name in models]
+        if found:
+            files.append(found[0])
+        elif names[-1] not in missing:
+            missing.append(names[-1])
+    if missing:
+        raise ValueError('No keycap model for {} in {}'.format(
+            ', '.join(missing), directory))
+    return files
+
+
+def model_names(width, height, row):
+    # Candidate model names for a key, best match first
+    size = '{:g}u'.format(round(width / Config.KEY_UNIT, 2))
+    if abs(height - Config.KEY_UNIT) > 1e-6:
+        size += 'x{:g}u'.format(round(height / Config.KEY_UNIT, 2))
+    if row:
+        return ['{}-r{:g}'.format(size, row), size]
+    return [size]
+
+
+def keycap_dir():
+    if Config.KEYCAP_DIR:
+        return Config.KEYCAP_DIR
+    return ui_commands.folder_select('Select the keycap models directory')
@@ -1,70 +1,295 @@
 import adsk.core
 import adsk.fusion
 from .. import Config
+from .. import Geometry
+from .. import Layout
+from .. import Mounting
 from .. import Sketches
+from .. import Stack
+from .. import Trace
 
 
-def full_case(keys):
-    elevation = 0
-    layer_attrs = {'bottom': {}, 'mid_1': {}, 'mid_0': {},
-                   'plate': {}, 'bezel_1': {}, 'bezel_0': {}}
-    layer_attrs['bottom']['elevation'] = elevation
-    layer_attrs['bottom']['thickness'] = Config.BOTTOM_THICKNESS
-    elevation += Config.BOTTOM_THICKNESS
-    layer_attrs['mid_1']['elevation'] = elevation
-    layer_attrs['mid_1']['thickness'] = Config.MID_THICKNESS_1
-    elevation += Config.MID_THICKNESS_1
-    layer_attrs['mid_0']['elevation'] = elevation
-    layer_attrs['mid_0']['thickness'] = Config.MID_THICKNESS_0
-    elevation += Config.MID_THICKNESS_0
-    layer_attrs['plate']['elevation'] = elevation
-    layer_attrs['plate']['thickness'] = Config.PLATE_THICKNESS
-    elevation += Config.PLATE_THICKNESS
-    layer_attrs['bezel_1']['elevation'] = elevation
-    layer_attrs['bezel_1']['thickness'] = Config.BEZEL_THICKNESS_1
-    elevation += Config.BEZEL_THICKNESS_1
-    layer_attrs['bezel_0']['elevation'] = elevation
-    layer_attrs['bezel_0']['thickness'] = Config.BEZEL_THICKNESS_0
-    elevation += Config.BEZEL_THICKNESS_0
-
-    # the first time we compute the bezel, remember the outline for
-    # the other layers
-    bezel_body_0, outline = bezel(keys, layer_attrs['bezel_0']['elevation'],
-                                  layer_attrs['bezel_0']['thickness'])
-    bezel_body_0.name = "BEZEL_0"
-    bezel_body_1, _ = bezel(keys, layer_attrs['bezel_1']['elevation'],
-                            layer_attrs['bezel_1']['thickness'])
-    bezel_body_1.name = "BEZEL_1"
-
-    plate_body = plate(outline, keys, layer_attrs['plate']['elevation'],
-                       layer_attrs['plate']['thickness'])
-    plate_body.name = "PLATE"
-
-    mid_body_0 = mid(outline, keys, layer_attrs['mid_0']['elevation'],
-                     layer_attrs['mid_0']['thickness'])
-    mid_body_0.name = "MID_0"
-    mid_body_1 = mid(outline, keys, layer_attrs['mid_1']['elevation'],
-                     layer_attrs['mid_1']['thickness'])
-    mid_body_1.name = "MID_1"
-
-    bottom_body = bottom(outline, layer_attrs['bottom']['elevation'],
-                         layer_attrs['bottom']['thickness'])
-    bottom_body.name = "BOTTOM"
-
-
-def extrude_with_cutout(body_sketch, cutout_sketch, elevation, thickness):
-    # Setup
-    app = adsk.core.Application.get()
-    product = app.activeProduct
-    design = adsk.fusion.Design.cast(product)
-    rootComp = design.rootComponent
-    extrudes = rootComp.features.extrudeFeatures
+def full_case(keys, stack=None):
+    layers = Stack.layers(stack)
+    usb_layers = Mounting.usb_layers(layers)
 
+    design = adsk.fusion.Design.cast(
+        adsk.core.Application.get().activeProduct)
+    cache = SketchCache(keys, design if Config.INCREMENTAL else None)
+    kept = set()
+    if Config.INCREMENTAL:
+        # Layers whose sketches are unchanged keep their extrusions, with
+        # elevations and thicknesses edited in place. The rest are deleted
+        # and rebuilt below.
+        kept = update_existing(design, cache, layers, usb_layers)
+    layers = [layer for layer in layers if layer['name'] not in kept]
+
+    # Every sketch and profile collection the stack needs is built once up
+    # front, however many layers share it. Each layer makes one cut, for
+    # its cutout, the screw holes and the USB cutout together.
+    if layers:
+        outline = cache.profiles(cache.outline())
+    cuts = [cache.layer_cut(layer['cutout'], layer['name'] in usb_layers)
+            for layer in layers]
+
+    extrudes = design.rootComponent.features.extrudeFeatures
+    for layer, cut in zip(layers, cuts):
+        tags = None
+        if Config.INCREMENTAL:
+            # Only incremental runs need to find their features again
+            tags = dict(layer=layer['name'],
+                        sketches=layer_sketches(cache, layer, usb_layers),
+                        params=layer_params(layer))
+        with Trace.stage('layer.{}'.format(layer['name'])):
+            body = extrude_layer(extrudes, outline, cut, layer['elevation'],
+                                 layer['thickness'], tags)
+            body.name = layer['name'].upper()
+    if Config.INCREMENTAL:
+        remove_unused_sketches(design, cache)
+
+
+# The sketch role of each of the Stack.CUTOUTS
+CUTOUT_ROLES = dict(bezel='bezel_cutout', hull='bezel_hull',
+                    switches='switch_cutouts')
+
+
+class SketchCache:
+    """Per-run cache of layer sketches and their profile collections
+
+    Given the design of an incremental run, sketches are tagged with their
+    fingerprint, and the previous run's sketches are reused when their
+    fingerprint still matches"""
+
+    def __init__(self, keys, design=None):
+        self.keys = keys
+        # Anything that changes the key geometry changes every fingerprint
+        self.key_inputs = keys.fingerprint()
+        self.tagged = design is not None
+        self.existing = {}
+        if design is not None:
+            for attribute in design.findAttributes(ATTRIBUTE_GROUP,
+                                                   'sketch'):
+                self.existing[attribute.value] = attribute.parent
+        # Fingerprints of the sketches this run's layers are built from
+        self.used = set()
+        self.entries = {}
+        self.cuts = {}
+        self._hull = None
+        self._mounting = None
+
+    def inputs(self, role):
+        # Everything a sketch depends on besides the keys
+        if role in ('bezel_cutout', 'bezel_hull'):
+            return (Config.BEZEL_KEY_BUFFER,)
+        if role == 'outline':
+            return (Config.BEZEL_KEY_BUFFER, Config.OUTLINE_OFFSET)
+        if role == 'switch_cutouts':
+            return (Config.SWITCH_DIAMETER, Layout.cutout_style(self.keys),
+                    Config.STABILIZERS)
+        # Screw holes and the USB cutout are placed around the hull
+        return (Config.BEZEL_KEY_BUFFER,) + Mounting.settings()
+
+    def fingerprint(self, role):
+        return '{}:{}:{!r}'.format(role, self.key_inputs, self.inputs(role))
+
+    def get(self, role, build):
+        fingerprint = self.fingerprint(role)
+        self.used.add(fingerprint)
+        if fingerprint not in self.entries:
+            sketch = self.existing.get(fingerprint)
+            if sketch is None:
+                sketch = build()
+                if self.tagged:
+                    tag(sketch, dict(sketch=fingerprint))
+            self.entries[fingerprint] = dict(sketch=sketch, profiles=None)
+        return self.entries[fingerprint]
+
+    def bezel_cutout(self):
+        def build():
+            sketch = Sketches.bezel_cutout(self.keys)
+            sketch.name = "bezel"
+            return sketch
+        return self.get('bezel_cutout', build)
+
+    def hull(self):
+        # The bezel cutouts' convex hull, shared by the hull and outline
+        # sketches and the mounting features
+        if self._hull is None:
+            self._hull = Geometry.convex_hull(
+                Layout.points(Layout.bezel_cutouts(self.keys)))
+        return self._hull
+
+    def bezel_hull(self):
+        def build():
+            sketch = Sketches.bezel_hull(self.keys, self.hull())
+            sketch.name = "bezel-hull"
+            return sketch
+        return self.get('bezel_hull', build)
+
+    def outline(self):
+        offset_amount = Config.OUTLINE_OFFSET
+
+        def build():
+            sketch = Sketches.outline(self.keys, offset_amount, self.hull())
+            sketch.name = "bezel-hull-plus-{}mm".format(offset_amount * 10)
+            return sketch
+        return self.get('outline', build)
+
+    def switch_cutouts(self):
+        def build():
+            return Sketches.switch_cutouts(self.keys)
+        return self.get('switch_cutouts', build)
+
+    def cutout(self, name):
+        # The sketch for one of the Stack.CUTOUTS
+        return getattr(self, CUTOUT_ROLES[name])()
+
+    def cut_roles(self, cutout, usb):
+        # The sketches one layer's cut is made of
+        roles = [CUTOUT_ROLES[cutout]] if cutout else []
+        if self.mounting()['screw_holes']:
+            roles.append('screw_holes')
+        if usb and self.mounting()['usb']:
+            roles.append('usb_cutout')
+        return roles
+
+    def mounting(self):
+        # Screw hole and USB cutout positions, worked out once
+        if self._mounting is None:
+            self._mounting = Mounting.mounting(self.keys, self.hull())
+        return self._mounting
+
+    def screw_holes(self):
+        holes = self.mounting()['screw_holes']
+        if not holes:
+            return None
+
+        def build():
+            return Sketches.screw_holes(holes, Config.SCREW_DIAMETER)
+        return self.get('screw_holes', build)
+
+    def usb_cutout(self):
+        usb = self.mounting()['usb']
+        if not usb:
+            return None
+
+        def build():
+            return Sketches.usb_cutout(usb)
+        return self.get('usb_cutout', build)
+
+    def layer_cut(self, cutout, usb):
+        # Everything one layer cuts out as one profile collection, None if
+        # nothing. Layers cutting the same things share the collection.
+        if (cutout, usb) not in self.cuts:
+            entries = [getattr(self, role)()
+                       for role in self.cut_roles(cutout, usb)]
+            if len(entries) > 1:
+                collection = adsk.core.ObjectCollection.create()
+                for entry in entries:
+                    profiles = self.profiles(entry)
+                    for i in range(profiles.count):
+                        collection.add(profiles.item(i))
+            else:
+                collection = self.profiles(entries[0]) if entries else None
+            self.cuts[(cutout, usb)] = collection
+        return self.cuts[(cutout, usb)]
+
+    def profiles(self, entry):
+        # Collect the sketch profiles once and hand out the same collection
+        if entry['profiles'] is None:
+            entry['profiles'] = profile_collection(entry['sketch'])
+        return entry['profiles']
+
+
+# Attribute group used to tag everything a run creates
+ATTRIBUTE_GROUP = 'KeebGen'
+
+
+def layer_sketches(cache, layer, usb_layers):
+    # The fingerprints of the outline and of everything the layer cuts out,
+    # none of which can change without rebuilding the layer
+    roles = ['outline'] + cache.cut_roles(layer['cutout'],
+                                          layer['name'] in usb_layers)
+    return '\n'.join(cache.fingerprint(role) for role in roles)
+
+
+def layer_params(layer):
+    # What can be edited in place
+    return '{elevation!r}:{thickness!r}'.format(**layer)
+
+
+def tag(entity, values):
+    for name, value in values.items():
+        entity.attributes.add(ATTRIBUTE_GROUP, name, value)
+
+
+def update_existing(design, cache, layers, usb_layers):
+    # Returns the names of the previous run's layers that are kept. Their
+    # elevations and thicknesses are edited in place. Layers whose sketches
+    # changed, or that left the stack, are deleted.
+    layers = {layer['name']: layer for layer in layers}
+    features = {}
+    for attribute in design.findAttributes(ATTRIBUTE_GROUP, 'layer'):
+        features.setdefault(attribute.value, []).append(attribute.parent)
+
+    kept = set()
+    for name, layer_features in features.items():
+        layer = layers.get(name)
+        if layer is None:
+            remove_features(layer_features)
+            continue
+        sketches = layer_sketches(cache, layer, usb_layers)
+        if any(value(feature, 'sketches') != sketches
+               for feature in layer_features):
+            remove_features(layer_features)
+            continue
+        kept.add(name)
+        cache.used.update(sketches.split('\n'))
+        params = layer_params(layer)
+        for feature in layer_features:
+            tagged = feature.attributes.itemByName(ATTRIBUTE_GROUP, 'params')
+            if tagged.value == params:
+                continue
+            feature.startExtent.offset.value = layer['elevation']
+            if feature.operation == \
+                    adsk.fusion.FeatureOperations.NewBodyFeatureOperation:
+                feature.extentOne.distance.value = layer['thickness']
+            tagged.value = params
+            Trace.count('edit')
+    return kept
+
+
+def value(entity, name):
+    attribute = entity.attributes.itemByName(ATTRIBUTE_GROUP, name)
+    return attribute.value if attribute else None
+
+
+def remove_features(features):
+    # A cut depends on its body, so it goes first
+    features = sorted(features, key=lambda feature: feature.operation !=
+                      adsk.fusion.FeatureOperations.CutFeatureOperation)
+    for feature in features:
+        feature.deleteMe()
+
+
+def remove_unused_sketches(design, cache):
+    # Sketches of an earlier run that no layer is built from any more
+    for attribute in design.findAttributes(ATTRIBUTE_GROUP, 'sketch'):
+        if attribute.value not in cache.used:
+            attribute.parent.deleteMe()
+
+
+def profile_collection(sketch):
+    profiles = sketch.profiles
+    collection = adsk.core.ObjectCollection.create()
+    for i in range(profiles.count):
+        collection.add(profiles.item(i))
+    return collection
+
+
+def extrude_layer(extrudes, bodyProfCollection, cutoutProfCollection,
+                  elevation, thickness, tags=None):
     # Extrude the main body
-    body_profiles = body_sketch.profiles
-    bodyProfCollection = adsk.core.ObjectCollection.create()
-    for i in range(body_profiles.count):
-        bodyProfCollection.add(body_profiles.item(i))
     bodyExtrudeInput = extrudes.createInput(
         bodyProfCollection, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
     extent_thickness = adsk.fusion.DistanceExtentDefinition.create(
@@ -75,13 +300,16 @@ def extrude_with_cutout(body_sketch, cutout_sketch, elevation, thickness):
         adsk.core.ValueInput.createByReal(elevation))
     bodyExtrudeInput.startExtent = elevation_extent
     body_extrusion = extrudes.add(bodyExtrudeInput)
+    Trace.count('extrude')
+    if tags:
+        tag(body_extrusion, tags)
     extruded_body = body_extrusion.bodies.item(0)
 
+    # Solid layers have nothing cut out of them
+    if cutoutProfCollection is None:
+        return extruded_body
+
     # Extrude cutout from the main body
-    cutout_profiles = cutout_sketch.profiles
-    cutoutProfCollection = adsk.core.ObjectCollection.create()
-    for i in range(cutout_profiles.count):
-        cutoutProfCollection.add(cutout_profiles.item(i))
     cutoutExtrudeInput = extrudes.createInput(
         cutoutProfCollection, adsk.fusion.FeatureOperations.CutFeatureOperation)
     isChained = True
@@ -91,78 +319,10 @@ def extrude_with_cutout(body_sketch, cutout_sketch, elevation, thickness):
     cutoutExtrudeInput.setOneSideExtent(
         extent_to_body, adsk.fusion.ExtentDirections.PositiveExtentDirection)
     cutoutExtrudeInput.startExtent = elevation_extent
-    extrudes.add(cutoutExtrudeInput)
-
-    # Return the body created by the extrusion
-    return extruded_body
-
-
-def extrude_basic(body_sketch, elevation, thickness):
-    # Setup
-    app = adsk.core.Application.get()
-    product = app.activeProduct
-    design = adsk.fusion.Design.cast(product)
-    rootComp = design.rootComponent
-    extrudes = rootComp.features.extrudeFeatures
-
-    # Extrude the main body
-    body_profiles = body_sketch.profiles
-    bodyProfCollection = adsk.core.ObjectCollection.create()
-    for i in range(body_profiles.count):
-        bodyProfCollection.add(body_profiles.item(i))
-    bodyExtrudeInput = extrudes.createInput(
-        bodyProfCollection, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
-    extent_thickness = adsk.fusion.DistanceExtentDefinition.create(
-        adsk.core.ValueInput.createByReal(thickness))
-    bodyExtrudeInput.setOneSideExtent(
-        extent_thickness, adsk.fusion.ExtentDirections.PositiveExtentDirection)
-    elevation_extent = adsk.fusion.OffsetStartDefinition.create(
-        adsk.core.ValueInput.createByReal(elevation))
-    bodyExtrudeInput.startExtent = elevation_extent
-    body_extrusion = extrudes.add(bodyExtrudeInput)
-    extruded_body = body_extrusion.bodies.item(0)
+    cutout_extrusion = extrudes.add(cutoutExtrudeInput)
+    Trace.count('extrude')
+    if tags:
+        tag(cutout_extrusion, tags)
 
     # Return the body created by the extrusion
     return extruded_body
-
-
-def bezel(keys, elevation, thickness):
-    # Make the relevant sketches
-    bezel_sketch = Sketches.bezel_cutout(keys)
-    bezel_sketch.name = "bezel"
-    bezel_hull_sketch = Sketches.bezel_hull(bezel_sketch)
-    bezel_hull_sketch.name = "bezel-hull"
-    offset_sketch = Sketches.offset_sketch(bezel_hull_sketch, 1)
-    offset_sketch.name = "bezel-hull-plus-10mm"
-
-    # Extrude and return
-    bezel_body = extrude_with_cutout(offset_sketch,
-                                     bezel_sketch, elevation, thickness)
-    return bezel_body, offset_sketch
-
-
-def mid(outline_sketch, keys, elevation, thickness):
-    # Make the relevant sketches
-    bezel_sketch = Sketches.bezel_cutout(keys)
-    bezel_sketch.name = "temp-bezel(mid)"
-    bezel_hull_sketch = Sketches.bezel_hull(bezel_sketch)
-    bezel_hull_sketch.name = "temp-bezel-hull(mid)"
-
-    # Extrude and return
-    mid_body = extrude_with_cutout(outline_sketch,
-                                   bezel_hull_sketch, elevation, thickness)
-    return mid_body
-
-
-def plate(outline_sketch, keys, elevation, thickness):
-    switch_cutout = Sketches.switch_cutouts(keys)
-    # Extrude and return
-    plate_body = extrude_with_cutout(outline_sketch,
-                                     switch_cutout, elevation, thickness)
-    return plate_body
-
-
-def bottom(outline_sketch, elevation, thickness):
-    # Extrude and return
-    mid_body = extrude_basic(outline_sketch, elevation, thickness)
-    return mid_body
@@ -0,0 +1,223 @@
+import math
+from .. import Config
+from .. import Cutouts
+from .. import Geometry
+from .. import KLE
+
+
+# Pure-python key geometry. Everything in here works on the float columns of
+# a KLE.KeyTable so the whole layout can be computed up front, before any
+# Fusion 360 API calls.
+# Polygons are lists of (x, y) tuples, counter-clockwise from the bottom
+# left corner, already rotated about each key's rotation point.
+
+
+def rectangles(keys, xs, ys, half_widths, half_heights):
+    # One rectangle per key centered on (xs[i], ys[i]), rotated about the
+    # key's rotation point. Each rotation cluster's sine and cosine are
+    # shared by all of its keys.
+    polygons = [None] * len(keys)
+    for cluster in keys.clusters():
+        corners = []
+        for i in cluster.keys:
+            x, y, hw, hh = xs[i], ys[i], half_widths[i], half_heights[i]
+            corners += [(x - hw, y - hh), (x + hw, y - hh),
+                        (x + hw, y + hh), (x - hw, y + hh)]
+        # The whole cluster is rotated in one go
+        corners = cluster.rotate_polygon(corners)
+        for n, i in enumerate(cluster.keys):
+            polygons[i] = corners[4 * n:4 * n + 4]
+    return polygons
+
+
+def cutout_style(keys):
+    # SWITCH_CUTOUT, or the cutout for the layout's switch type
+    return Config.SWITCH_CUTOUT or KLE.switch_type(keys)
+
+
+def switch_cutouts(keys):
+    # One switch hole per key
+    hole = Cutouts.switch_hole(cutout_style(keys))
+    return [polygons[0] for polygons in instances(keys, [hole] * len(keys))]
+
+
+def stabilizer_cutouts(keys):
+    # Stabilizer slots for every key long enough to need them, in key order
+    templates = [Cutouts.stabilizer(w, h)
+                 for w, h in zip(keys.width, keys.height)]
+    return [slot for slots in instances(keys, templates) for slot in slots]
+
+
+def instances(keys, templates):
+    # Place templates[i], polygons around the origin, on key i. Keys of a
+    # rotation cluster are rotated together.
+    placed = [()] * len(keys)
+    for cluster in keys.clusters():
+        for i in cluster.keys:
+            if templates[i]:
+                x, y = keys.x[i], keys.y[i]
+                placed[i] = [cluster.rotate_polygon(
+                    [(x + dx, y + dy) for dx, dy in polygon])
+                    for polygon in templates[i]]
+    return placed
+
+
+def plate_cutouts(keys):
+    # Everything cut out of the switch plate
+    return switch_cutouts(keys) + stabilizer_cutouts(keys)
+
+
+def bezel_cutouts(keys):
+    buffer = Config.BEZEL_KEY_BUFFER
+    polygons = rectangles(keys, keys.x, keys.y,
+                          [w / 2 + buffer for w in keys.width],
+                          [h / 2 + buffer for h in keys.height])
+    # Non-rectangular keys (ISO enter, stepped keys) also get their second
+    # rectangle, the cutout is the union of both
+    shaped = [i for i in range(len(keys)) if shaped_key(keys, i)]
+    if shaped:
+        second = rectangles(keys, keys.x2, keys.y2,
+                            [w / 2 + buffer for w in keys.width2],
+                            [h / 2 + buffer for h in keys.height2])
+        polygons.extend(second[i] for i in shaped)
+    return polygons
+
+
+def bezel_regions(keys):
+    # The bezel cutout as a few outer loops instead of a rectangle per key.
+    # Keys sharing a rotation are axis aligned about their rotation point,
+    # so each rotation cluster is merged there on a grid and rotated back.
+    # Clusters that overlap each other fall back to the general union.
+    buffer = Config.BEZEL_KEY_BUFFER
+    merged = []
+    for cluster in keys.clusters():
+        boxes = []
+        for i in cluster.keys:
+            rects = [(keys.x[i], keys.y[i], keys.width[i], keys.height[i])]
+            if shaped_key(keys, i):
+                rects.append((keys.x2[i], keys.y2[i], keys.width2[i],
+                              keys.height2[i]))
+            for x, y, w, h in rects:
+                boxes.append((x - w / 2 - buffer, y - h / 2 - buffer,
+                              x + w / 2 + buffer, y + h / 2 + buffer))
+        loops = [cluster.rotate_polygon(loop)
+                 for loop in Geometry.union_rectangles(boxes)]
+        polygons = [cluster.rotate_polygon(
+            [(x0, y0), (x1, y0), (x1, y1), (x0, y1)])
+            for x0, y0, x1, y1 in boxes]
+        merged.append((Geometry.bounds(points(loops)), loops, polygons))
+
+    # Group clusters whose bounds overlap
+    groups = []
+    for cluster in merged:
+        overlapping = [group for group in groups
+                       if any(boxes_overlap(cluster[0], other[0])
+                              for other in group)]
+        for group in overlapping:
+            groups.remove(group)
+        groups.append(sum(overlapping, [cluster]))
+    regions = []
+    for group in groups:
+        if len(group) == 1:
+            regions.extend(group[0][1])
+            continue
+        # A cluster's merged loops stand in for its rectangles, unless it
+        # has holes, which the general union can't take as input
+        polygons = []
+        for bounds, loops, rects in group:
+            if any(Geometry.area(loop) < 0 for loop in loops):
+                polygons.extend(rects)
+            else:
+                polygons.extend(loops)
+        regions.extend(Geometry.union(polygons))
+    # Pockets enclosed by keys come back as holes. They would be loose
+    # islands in the bezel, and cutting a rectangle per key always removed
+    # them, so only the outer loops are kept.
+    return [loop for loop in regions if Geometry.area(loop) > 0]
+
+
+def boxes_overlap(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def shaped_key(keys, i):
+    return (keys.x2[i], keys.y2[i], keys.width2[i], keys.height2[i]) != \
+        (keys.x[i], keys.y[i], keys.width[i], keys.height[i])
+
+
+def points(polygons):
+    # Flatten a list of polygons into one point cloud
+    return [p for polygon in polygons for p in polygon]
+
+
+def world_placements(keys, offset_x, offset_y):
+    # Planar rigid transform (angle, tx, ty) that takes a model at the
+    # origin onto each key. offset_x/offset_y is the model origin relative to
+    # the key center.
+    world = [None] * len(keys)
+    for cluster in keys.clusters():
+        # Translate onto each key, then rotate about the rotation point
+        points = cluster.rotate_polygon(
+            [(keys.x[i] + offset_x, keys.y[i] + offset_y)
+             for i in cluster.keys])
+        for i, (tx, ty) in zip(cluster.keys, points):
+            world[i] = (cluster.angle, tx, ty)
+    return world
+
+
+def relative_placements(world):
+    # Planar rigid transform (angle, tx, ty) that takes a model placed at the
+    # first key onto each key, from their world_placements
+    ng0, bx0, by0 = world[0]
+    # The first key rotated by each distinct angle, keys of a rotation
+    # cluster all share one
+    starts = {}
+    transforms = []
+    for ng, bx, by in world:
+        if ng not in starts:
+            c = math.cos(ng - ng0)
+            s = math.sin(ng - ng0)
+            starts[ng] = (bx0 * c - by0 * s, bx0 * s + by0 * c)
+        sx, sy = starts[ng]
+        transforms.append((ng - ng0, bx - sx, by - sy))
+    return transforms
+
+
+def pattern_runs(keys, transforms, min_length=3):
+    # Unrotated keys that sit in a row at a constant pitch can be placed as a
+    # single pattern along x. Returns runs of key indices, anything that
+    # can't be patterned comes back as a run of one. The first key is left
+    # out, it is where the model was imported.
+    rows = {}
+    runs = []
+    for cluster in keys.clusters():
+        for i in cluster.keys:
+            if i == 0:
+                continue
+            if cluster.angle == 0:
+                rows.setdefault(round(transforms[i][2], 6), []).append(i)
+            else:
+                runs.append([i])
+
+    for row in rows.values():
+        row.sort(key=lambda i: transforms[i][1])
+        run = [row[0]]
+        for i in row[1:]:
+            pitch = transforms[i][1] - transforms[run[-1]][1]
+            # Keys stacked on the same spot would make a zero spacing
+            # pattern, which Fusion rejects
+            if abs(pitch) > 1e-6 and (len(run) == 1 or abs(
+                    pitch - (transforms[run[1]][1] -
+                             transforms[run[0]][1])) < 1e-6):
+                run.append(i)
+            else:
+                runs.extend(split_run(run, min_length))
+                run = [i]
+        runs.extend(split_run(run, min_length))
+    return sorted(runs)
+
+
+def split_run(run, min_length):
+    if len(run) >= min_length:
+        return [run]
+    return [[i] for i in run]
@@ -0,0 +1,98 @@
+import hashlib
+import os
+import adsk.core
+from .. import Cache
+from .. import Config
+from .. import Trace
+
+
+# Imported STEP models (switches, keycaps), kept as components. A model
+# that is already in the design is reused, one imported before is loaded
+# from its Fusion archive in the cache directory, and anything else is
+# imported from STEP once, prepared and archived for next time. Models are
+# keyed by name, and remember the path and modification time of the STEP
+# file they came from, so a different or edited file is imported again.
+
+# Attribute group the model components are tagged with
+ATTRIBUTE_GROUP = 'KeebGen'
+# Bump whenever archives are written differently, so stale ones are never
+# used
+VERSION = 1
+
+
+def get_component(design, name, step_file, variant='', prepare=None):
+    """The model as a component, and the occurrence an import created
+
+    step_file is the model's STEP file, or a function that asks for one.
+    The function is only called when there is no stored model of that name
+    to use. prepare(component) runs once, before the model is archived.
+    Models prepared differently need a different variant."""
+    key = '{}:{}:{}'.format(VERSION, name, variant)
+    # Without a file to compare with, any stored model of the name will do
+    source = None if callable(step_file) else file_source(step_file)
+    for attribute in design.findAttributes(ATTRIBUTE_GROUP, 'model'):
+        component = attribute.parent
+        if attribute.value == key and source in (
+                None, value(component, 'source')):
+            Trace.count('model_reuse')
+            return component, None
+
+    app = adsk.core.Application.get()
+    rootComp = design.rootComponent
+    archive = archive_path(key) if Config.USE_CACHE else None
+    archived = archive_source(archive) if archive else None
+    if archived is not None and source in (None, archived):
+        options = app.importManager.createFusionArchiveImportOptions(archive)
+        occurrence = app.importManager.importToTarget2(
+            options, rootComp).item(0)
+        source = archived
+        Trace.count('model_archive')
+    else:
+        if source is None:
+            step_file = step_file()
+            source = file_source(step_file)
+        options = app.importManager.createSTEPImportOptions(step_file)
+        occurrence = app.importManager.importToTarget2(
+            options, rootComp).item(0)
+        if prepare:
+            prepare(occurrence.component)
+        Trace.count('model_import')
+        if archive:
+            os.makedirs(os.path.dirname(archive), exist_ok=True)
+            exportManager = design.exportManager
+            exportManager.execute(
+                exportManager.createFusionArchiveExportOptions(
+                    archive, occurrence.component))
+            with open(archive + '.source', 'w', encoding='utf-8') as fp:
+                fp.write(source)
+    attributes = occurrence.component.attributes
+    attributes.add(ATTRIBUTE_GROUP, 'model', key)
+    attributes.add(ATTRIBUTE_GROUP, 'source', source)
+    return occurrence.component, occurrence
+
+
+def value(entity, name):
+    attribute = entity.attributes.itemByName(ATTRIBUTE_GROUP, name)
+    return attribute.value if attribute else None
+
+
+def file_source(file_name):
+    # Where a model came from, cheap enough to check on every run
+    file_name = os.path.abspath(file_name)
+    return '{}:{!r}'.format(file_name, os.path.getmtime(file_name))
+
+
+def archive_source(archive):
+    # The source of an archived model, None if there is no archive
+    if not os.path.exists(archive):
+        return None
+    try:
+        with open(archive + '.source', encoding='utf-8') as fp:
+            return fp.read()
+    except OSError:
+        return None
+
+
+def archive_path(key):
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return os.path.join(Cache.cache_dir(), 'models', digest + '.f3d')
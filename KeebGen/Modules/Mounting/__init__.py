@@ -0,0 +1,117 @@
+from .. import Config
+from .. import Geometry
+from .. import Layout
+
+
+# Screw holes and the USB cutout. Both go in the margin between the bezel
+# hull and the outer edge of the case, which every layer keeps (the mid
+# layers cut the hull out), and every key lies inside the hull. A hole
+# that clears the hull and the case edge clears every cutout too.
+
+# Distance between candidate screw hole positions along the margin
+STEP = 0.05
+
+
+def settings():
+    # Everything the mounting features depend on besides the keys
+    return (Config.SCREW_HOLES, Config.SCREW_DIAMETER, Config.SCREW_CLEARANCE,
+            Config.OUTLINE_OFFSET, Config.USB_POSITION, Config.USB_WIDTH)
+
+
+def mounting(keys, hull=None):
+    """Screw hole centers and the USB cutout polygon (or None)"""
+    if hull is None:
+        hull = Geometry.convex_hull(Layout.points(Layout.bezel_cutouts(keys)))
+    usb = usb_cutout(hull)
+    return dict(screw_holes=screw_holes(hull, usb), usb=usb)
+
+
+def screw_holes(hull, usb=None):
+    # Config.SCREW_HOLES centers on the middle line of the margin, spread
+    # as far apart as they go: the first sits nearest the top left corner
+    # and each next one is the candidate farthest from all placed so far
+    count = Config.SCREW_HOLES
+    if not count:
+        return []
+    radius = Config.SCREW_DIAMETER / 2
+    keep_out = radius + Config.SCREW_CLEARANCE
+    margin = Config.OUTLINE_OFFSET / 2
+    if keep_out > margin:
+        raise ValueError(
+            'Screw holes of {:.2f} mm with {:.2f} mm clearance need a case '
+            'margin (OUTLINE_OFFSET) of at least {:.2f} mm'.format(
+                Config.SCREW_DIAMETER * 10, Config.SCREW_CLEARANCE * 10,
+                keep_out * 20))
+    candidates = Geometry.sample(Geometry.offset_convex(hull, margin), STEP)
+    if usb:
+        x0, y0, x1, y1 = Geometry.bounds(usb)
+        candidates = [(x, y) for x, y in candidates
+                      if not (x0 - keep_out < x < x1 + keep_out and
+                              y0 - keep_out < y < y1 + keep_out)]
+
+    hx0, hy0, hx1, hy1 = Geometry.bounds(hull)
+    first = min(candidates, key=lambda p: (p[0] - hx0) ** 2 +
+                (p[1] - hy1) ** 2)
+    holes = [first]
+    # Squared distance from every candidate to its nearest placed hole
+    nearest = [(x - first[0]) ** 2 + (y - first[1]) ** 2
+               for x, y in candidates]
+    while len(holes) < count:
+        best = max(range(len(candidates)), key=nearest.__getitem__)
+        if nearest[best] < (2 * radius + Config.SCREW_CLEARANCE) ** 2:
+            raise ValueError('Only room for {} screw holes in the case '
+                             'margin, not {}'.format(len(holes), count))
+        hole = candidates[best]
+        holes.append(hole)
+        nearest = [min(d, (x - hole[0]) ** 2 + (y - hole[1]) ** 2)
+                   for d, (x, y) in zip(nearest, candidates)]
+    return holes
+
+
+def usb_cutout(hull):
+    # A slot USB_WIDTH wide from inside the hull out through the top edge
+    # of the case. USB_POSITION is its center in key units from the left of
+    # the layout, the leftmost key edge just inside the hull, or 'center'.
+    position = Config.USB_POSITION
+    if position is None:
+        return None
+    x0, y0, x1, y1 = Geometry.bounds(hull)
+    if position == 'center':
+        x = (x0 + x1) / 2
+    else:
+        x = x0 + Config.BEZEL_KEY_BUFFER + position * Config.KEY_UNIT
+    half = Config.USB_WIDTH / 2
+    tops = [hull_top(hull, px) for px in (x - half, x, x + half)]
+    if None in tops:
+        raise ValueError('The USB cutout at {} is outside the case'.format(
+            position))
+    # Overlap the hull a little so the slot opens into the case
+    bottom = min(tops) - Config.BEZEL_KEY_BUFFER
+    top = y1 + Config.OUTLINE_OFFSET + Config.BEZEL_KEY_BUFFER
+    return [(x - half, bottom), (x + half, bottom), (x + half, top),
+            (x - half, top)]
+
+
+def hull_top(hull, x):
+    # Highest point of the convex hull above x, None past its ends
+    tops = []
+    for (ax, ay), (bx, by) in zip(hull, hull[1:] + hull[:1]):
+        if min(ax, bx) <= x <= max(ax, bx):
+            if ax == bx:
+                tops.append(max(ay, by))
+            else:
+                tops.append(ay + (by - ay) * (x - ax) / (bx - ax))
+    return max(tops) if tops else None
+
+
+def usb_layers(layers):
+    # Names of the Stack.layers the USB cutout goes through
+    names = [layer['name'] for layer in layers]
+    if Config.USB_LAYERS is None:
+        return [layer['name'] for layer in layers
+                if layer['cutout'] == 'hull']
+    for name in Config.USB_LAYERS:
+        if name not in names:
+            raise ValueError('USB_LAYERS names {!r}, which is not a layer '
+                             'of the case'.format(name))
+    return list(Config.USB_LAYERS)
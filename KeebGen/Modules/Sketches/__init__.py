@@ -1,138 +1,134 @@
+import contextlib
+import math
 import adsk.core
 import adsk.fusion
-from .. import Config
 from .. import Geometry
+from .. import Layout
+from .. import Trace
 
 
+@Trace.timed('sketch.switch_cutouts')
 def switch_cutouts(keys):
-    app = adsk.core.Application.get()
-    product = app.activeProduct
-    design = adsk.fusion.Design.cast(product)
-    rootComp = design.rootComponent
-    sketches = rootComp.sketches
-    sketchCutout = sketches.add(rootComp.xYConstructionPlane)
-    sketchLinesCutout = sketchCutout.sketchCurves.sketchLines
-    for key in keys:
-        x = key['x']
-        y = key['y']
-        ng = key['rotation_angle']
-        centerPointCutout = adsk.core.Point3D.create(x, y, 0)
-        cornerPointCutout = adsk.core.Point3D.create(
-            x + Config.SWITCH_DIAMETER/2, y + Config.SWITCH_DIAMETER/2, 0)
-        rect = sketchLinesCutout.addCenterPointRectangle(centerPointCutout,
-                                                         cornerPointCutout)
-        centerPointRotation = adsk.core.Point3D.create(
-            key["rotation_x"], key["rotation_y"], 0)
-        sketchParts = adsk.core.ObjectCollection.create()
-        for c in rect:
-            sketchParts.add(c)
-        ogTransform = sketchCutout.transform.copy()
-        rotZ = adsk.core.Matrix3D.create()
-        rotZ.setToRotation(
-            ng,
-            adsk.core.Vector3D.create(
-                0, 0, 1
-            ),
-            centerPointRotation
-        )
-        ogTransform.transformBy(rotZ)
-        sketchCutout.move(sketchParts, ogTransform)
+    sketchCutout = new_sketch()
+    draw_polygons(sketchCutout, Layout.plate_cutouts(keys))
     sketchCutout.name = "switch-cutouts"
     return sketchCutout
 
 
+@Trace.timed('sketch.bezel_cutout')
 def bezel_cutout(keys):
-    app = adsk.core.Application.get()
-    product = app.activeProduct
-    design = adsk.fusion.Design.cast(product)
-
-    # Get the root component of the active design
-    rootComp = design.rootComponent
-    sketches = rootComp.sketches
-    sketchCutout = sketches.add(rootComp.xYConstructionPlane)
-    sketchLinesCutout = sketchCutout.sketchCurves.sketchLines
-    for key in keys:
-        x = key['x']
-        y = key['y']
-        ng = key['rotation_angle']
-        # ui.messageBox('angle degrees:{}\nangle radians{}'.format(
-        #     key['rotation_angle'], ng))
-        centerPointCutout = adsk.core.Point3D.create(x, y, 0)
-        cornerPointCutout = adsk.core.Point3D.create(
-            x + key['width']/2 + Config.BEZEL_KEY_BUFFER,
-            y + key['height']/2 + Config.BEZEL_KEY_BUFFER,
-            0
-        )
-        rect = sketchLinesCutout.addCenterPointRectangle(centerPointCutout,
-                                                         cornerPointCutout)
-        centerPointRotation = adsk.core.Point3D.create(
-            key["rotation_x"], key["rotation_y"], 0)
-        sketchParts = adsk.core.ObjectCollection.create()
-        for c in rect:
-            sketchParts.add(c)
-        # for p in sketchCutout.sketchPoints:
-        #     sketchParts.add(p)
-        ogTransform = sketchCutout.transform.copy()
-        rotZ = adsk.core.Matrix3D.create()
-        rotZ.setToRotation(
-            ng,
-            adsk.core.Vector3D.create(
-                0, 0, 1
-            ),
-            centerPointRotation
-        )
-        ogTransform.transformBy(rotZ)
-        sketchCutout.move(sketchParts, ogTransform)
+    sketchCutout = new_sketch()
+    # Overlapping and touching key rectangles are merged before sketching
+    draw_polygons(sketchCutout, Layout.bezel_regions(keys))
     sketchCutout.name = "bezel-cutout"
     return sketchCutout
 
 
-def bezel_hull(bezel_sketch):
-    app = adsk.core.Application.get()
-    product = app.activeProduct
-    design = adsk.fusion.Design.cast(product)
-    rootComp = design.rootComponent
-    sketches = rootComp.sketches
-    sketch = sketches.add(rootComp.xYConstructionPlane)
-
-    # Start indexing at 1 because the first point is just the origin
-    bezel_points = [bezel_sketch.sketchPoints.item(i).geometry
-                    for i in range(1, bezel_sketch.sketchPoints.count)]
-    points = Geometry.convex_hull(bezel_points)
-
-    point3ds = [adsk.core.Point3D.create(p.x, p.y, p.z) for p in points]
-    sketch_points = [sketch.sketchPoints.add(p) for p in point3ds]
-    for i in range(len(sketch_points) - 1):
-        sketch.sketchCurves.sketchLines.addByTwoPoints(
-            sketch_points[i], sketch_points[i+1])
-    sketch.sketchCurves.sketchLines.addByTwoPoints(
-        sketch_points[-1], sketch_points[0])
+@Trace.timed('sketch.screw_holes')
+def screw_holes(centers, diameter):
+    sketch = new_sketch()
+    sketchCircles = sketch.sketchCurves.sketchCircles
+    with deferred(sketch):
+        for x, y in centers:
+            sketchCircles.addByCenterRadius(
+                adsk.core.Point3D.create(x, y, 0), diameter / 2)
+    sketch.name = "screw-holes"
+    return sketch
+
+
+@Trace.timed('sketch.usb_cutout')
+def usb_cutout(polygon):
+    sketch = new_sketch()
+    draw_polygons(sketch, [polygon])
+    sketch.name = "usb-cutout"
     return sketch
 
 
-def offset_sketch(closed_sketch, offset_amount):
-    innerCurves = adsk.core.ObjectCollection.create()
-    curves = closed_sketch.sketchCurves
-    for i in range(curves.count):
-        innerCurves.add(curves.item(i))
-    # assume a point in the negative xy quadrant is outside
-    outside_point = adsk.core.Point3D.create(-10, -10, 0)
-    offsetCurves = closed_sketch.offset(
-        innerCurves, outside_point, offset_amount)
-    # outerCurves = adsk.core.ObjectCollection.create()
-    # for i in range(offsetCurves.count):
-    #     outerCurves.add(offsetCurves.item(i))
-
-    # copy the offset curves over to a new sketch
+def new_sketch():
     app = adsk.core.Application.get()
     product = app.activeProduct
     design = adsk.fusion.Design.cast(product)
+
+    # Get the root component of the active design
     rootComp = design.rootComponent
     sketches = rootComp.sketches
-    outerSketch = sketches.add(rootComp.xYConstructionPlane)
-    closed_sketch.copy(offsetCurves, adsk.core.Matrix3D.create(), outerSketch)
-    outerSketch.name = closed_sketch.name + \
-        "-offset-" + str(offset_amount / 10) + "mm"
-    for i in range(offsetCurves.count):
-        offsetCurves.item(i).deleteMe()
-    return outerSketch
+    return sketches.add(rootComp.xYConstructionPlane)
+
+
+@contextlib.contextmanager
+def deferred(sketch):
+    # Fusion recomputes a sketch and its profiles after every new curve
+    # unless compute is deferred, then it does it once at the end
+    sketch.isComputeDeferred = True
+    try:
+        yield sketch
+    finally:
+        sketch.isComputeDeferred = False
+
+
+def draw_polygons(sketch, polygons):
+    # Draw closed loops from precomputed (already rotated) corner points
+    sketchLines = sketch.sketchCurves.sketchLines
+    with deferred(sketch):
+        for polygon in polygons:
+            points = [adsk.core.Point3D.create(x, y, 0) for x, y in polygon]
+            first = line = sketchLines.addByTwoPoints(points[0], points[1])
+            for p in points[2:]:
+                line = sketchLines.addByTwoPoints(line.endSketchPoint, p)
+            sketchLines.addByTwoPoints(line.endSketchPoint,
+                                       first.startSketchPoint)
+    return sketch
+
+
+@Trace.timed('sketch.bezel_hull')
+def bezel_hull(keys, hull=None):
+    sketch = new_sketch()
+    # The hull only needs the cutout corners, so it is computed on plain
+    # floats and converted to Point3D when it is drawn
+    if hull is None:
+        hull = Geometry.convex_hull(Layout.points(Layout.bezel_cutouts(keys)))
+    draw_polygons(sketch, [hull])
+    return sketch
+
+
+@Trace.timed('sketch.outline')
+def outline(keys, offset_amount, hull=None):
+    # The hull pushed out by offset_amount with rounded corners, computed
+    # in Python so the sketch only gets the final loop
+    if hull is None:
+        hull = Geometry.convex_hull(Layout.points(Layout.bezel_cutouts(keys)))
+    sketch = new_sketch()
+    draw_segments(sketch, Geometry.offset_convex(hull, offset_amount))
+    return sketch
+
+
+def draw_segments(sketch, segments):
+    # Draw one closed loop of ('line', ...) and ('arc', ...) segments. An
+    # arc's end point follows from its sweep, so the loop is closed by a
+    # line.
+    while segments[-1][0] != 'line':
+        segments = segments[-1:] + segments[:-1]
+    sketchLines = sketch.sketchCurves.sketchLines
+    sketchArcs = sketch.sketchCurves.sketchArcs
+    with deferred(sketch):
+        first = last = None
+        for i, segment in enumerate(segments):
+            if segment[0] == 'line':
+                _, (x0, y0), (x1, y1) = segment
+                start = last or adsk.core.Point3D.create(x0, y0, 0)
+                if i == len(segments) - 1:
+                    end = first.startSketchPoint
+                else:
+                    end = adsk.core.Point3D.create(x1, y1, 0)
+                curve = sketchLines.addByTwoPoints(start, end)
+            else:
+                _, (cx, cy), radius, start_angle, end_angle = segment
+                start = last or adsk.core.Point3D.create(
+                    cx + radius * math.cos(start_angle),
+                    cy + radius * math.sin(start_angle), 0)
+                curve = sketchArcs.addByCenterStartSweep(
+                    adsk.core.Point3D.create(cx, cy, 0), start,
+                    end_angle - start_angle)
+            first = first or curve
+            last = curve.endSketchPoint
+    return sketch
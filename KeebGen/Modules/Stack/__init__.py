@@ -0,0 +1,54 @@
+from .. import Config
+
+
+# The case is a stack of layers, each one the case outline with a cutout
+# taken out of it:
+#   'bezel'    the key rectangles, for the layers around the keycaps
+#   'hull'     everything inside the bezel, for the hollow mid layers
+#   'switches' the switch holes, for the plate
+#   None       nothing, a solid layer
+CUTOUTS = ('bezel', 'hull', 'switches', None)
+
+
+def default_stack():
+    # The classic six layer sandwich, from the top down
+    return [
+        ('bezel_0', Config.BEZEL_THICKNESS_0, 'bezel'),
+        ('bezel_1', Config.BEZEL_THICKNESS_1, 'bezel'),
+        ('plate', Config.PLATE_THICKNESS, 'switches'),
+        ('mid_0', Config.MID_THICKNESS_0, 'hull'),
+        ('mid_1', Config.MID_THICKNESS_1, 'hull'),
+        ('bottom', Config.BOTTOM_THICKNESS, None),
+    ]
+
+
+def layers(stack=None):
+    """The layer stack from the top down, with every layer's elevation"""
+    stack = stack or Config.LAYER_STACK or default_stack()
+    result = []
+    names = set()
+    for name, thickness, cutout in stack:
+        if cutout not in CUTOUTS:
+            raise ValueError('Layer {} has unknown cutout {!r}'.format(
+                name, cutout))
+        if name in names:
+            raise ValueError('Layer {} is in the stack twice'.format(name))
+        if thickness <= 0:
+            raise ValueError('Layer {} has thickness {}'.format(
+                name, thickness))
+        names.add(name)
+        result.append(dict(name=name, thickness=thickness, cutout=cutout))
+    # Elevations are worked out bottom up, in one pass
+    elevation = 0
+    for layer in reversed(result):
+        layer['elevation'] = elevation
+        elevation += layer['thickness']
+    return result
+
+
+def plate_height(layers):
+    # Top of the highest switch plate, where the switches sit. Without a
+    # plate they sit on top of the stack.
+    plates = [layer for layer in layers if layer['cutout'] == 'switches']
+    top = plates[0] if plates else layers[0]
+    return top['elevation'] + top['thickness']
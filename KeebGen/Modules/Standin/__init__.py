@@ -0,0 +1,54 @@
+import collections
+import os
+import sys
+import tempfile
+import types
+
+
+# A stand-in for the parts of the Fusion 360 API this script uses, so the
+# whole pipeline can run (and be timed) outside of Fusion. Every API call
+# is counted in `calls`, and the objects keep the geometry they were given
+# so the results can be inspected afterwards.
+
+calls = collections.Counter()
+
+
+def record(name):
+    calls[name] += 1
+
+
+def install():
+    # Register the stand-in as the adsk, adsk.core and adsk.fusion modules.
+    # Does nothing inside Fusion, where the real API is already importable.
+    if 'adsk' in sys.modules and \
+            not getattr(sys.modules['adsk'], 'is_standin', False):
+        return False
+    from . import core
+    from . import fusion
+    adsk = types.ModuleType('adsk')
+    adsk.is_standin = True
+    adsk.core = core
+    adsk.fusion = fusion
+    sys.modules['adsk'] = adsk
+    sys.modules['adsk.core'] = core
+    sys.modules['adsk.fusion'] = fusion
+    return True
+
+
+def switch_file():
+    # A placeholder STEP file for switch insertion, the stand-in never
+    # reads it
+    path = os.path.join(tempfile.gettempdir(), 'keebgen-standin-switch.step')
+    if not os.path.exists(path):
+        with open(path, 'w') as fp:
+            fp.write('ISO-10303-21;\nEND-ISO-10303-21;\n')
+    return path
+
+
+def reset():
+    # Fresh application with one empty design, and no recorded calls
+    from . import core
+    core.Application._app = None
+    app = core.Application.get()
+    calls.clear()
+    return app
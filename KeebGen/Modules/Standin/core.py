@@ -0,0 +1,329 @@
+import math
+from . import record
+
+
+class Point3D:
+
+    def __init__(self, x, y, z):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    @staticmethod
+    def create(x=0, y=0, z=0):
+        record('Point3D.create')
+        return Point3D(x, y, z)
+
+    def asVector(self):
+        return Vector3D(self.x, self.y, self.z)
+
+    def copy(self):
+        return Point3D(self.x, self.y, self.z)
+
+    def transformBy(self, matrix):
+        self.x, self.y, self.z = matrix.apply(self.x, self.y, self.z)
+        return True
+
+    def isEqualTo(self, other):
+        return (self.x, self.y, self.z) == (other.x, other.y, other.z)
+
+
+class Vector3D(Point3D):
+
+    @staticmethod
+    def create(x=0, y=0, z=0):
+        record('Vector3D.create')
+        return Vector3D(x, y, z)
+
+    def add(self, other):
+        self.x += other.x
+        self.y += other.y
+        self.z += other.z
+        return True
+
+    def subtract(self, other):
+        self.x -= other.x
+        self.y -= other.y
+        self.z -= other.z
+        return True
+
+    def asPoint(self):
+        return Point3D(self.x, self.y, self.z)
+
+
+class Matrix3D:
+    """4x4 row-major matrix, with the real matrix maths"""
+
+    def __init__(self, cells=None):
+        self.cells = list(cells) if cells else [
+            1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1]
+
+    @staticmethod
+    def create():
+        record('Matrix3D.create')
+        return Matrix3D()
+
+    def asArray(self):
+        return list(self.cells)
+
+    def setWithArray(self, cells):
+        self.cells = list(cells)
+        return True
+
+    def copy(self):
+        return Matrix3D(self.cells)
+
+    def setToRotation(self, angle, axis, origin):
+        record('Matrix3D.setToRotation')
+        length = math.sqrt(axis.x ** 2 + axis.y ** 2 + axis.z ** 2)
+        x, y, z = axis.x / length, axis.y / length, axis.z / length
+        c = math.cos(angle)
+        s = math.sin(angle)
+        t = 1 - c
+        rotation = [t * x * x + c, t * x * y - s * z, t * x * z + s * y,
+                    t * x * y + s * z, t * y * y + c, t * y * z - s * x,
+                    t * x * z - s * y, t * y * z + s * x, t * z * z + c]
+        o = (origin.x, origin.y, origin.z)
+        cells = []
+        for row in range(3):
+            r = rotation[row * 3:row * 3 + 3]
+            cells.extend(r)
+            cells.append(o[row] - sum(r[i] * o[i] for i in range(3)))
+        self.cells = cells + [0, 0, 0, 1]
+        return True
+
+    def transformBy(self, matrix):
+        # this = matrix * this
+        a, b = matrix.cells, self.cells
+        self.cells = [sum(a[row * 4 + i] * b[i * 4 + col] for i in range(4))
+                      for row in range(4) for col in range(4)]
+        return True
+
+    def invert(self):
+        # Rigid transforms only: transpose the rotation, rotate the
+        # translation back
+        c = self.cells
+        rotation = [c[0], c[4], c[8], c[1], c[5], c[9], c[2], c[6], c[10]]
+        t = (c[3], c[7], c[11])
+        cells = []
+        for row in range(3):
+            r = rotation[row * 3:row * 3 + 3]
+            cells.extend(r)
+            cells.append(-sum(r[i] * t[i] for i in range(3)))
+        self.cells = cells + [0, 0, 0, 1]
+        return True
+
+    @property
+    def translation(self):
+        return Vector3D(self.cells[3], self.cells[7], self.cells[11])
+
+    @translation.setter
+    def translation(self, vector):
+        self.cells[3] = vector.x
+        self.cells[7] = vector.y
+        self.cells[11] = vector.z
+
+    def apply(self, x, y, z):
+        c = self.cells
+        return (c[0] * x + c[1] * y + c[2] * z + c[3],
+                c[4] * x + c[5] * y + c[6] * z + c[7],
+                c[8] * x + c[9] * y + c[10] * z + c[11])
+
+
+class ObjectCollection:
+
+    def __init__(self, items=()):
+        self.items = list(items)
+
+    @staticmethod
+    def create():
+        record('ObjectCollection.create')
+        return ObjectCollection()
+
+    def add(self, item):
+        self.items.append(item)
+        return True
+
+    @property
+    def count(self):
+        return len(self.items)
+
+    def item(self, i):
+        return self.items[i]
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+class Attributes(ObjectCollection):
+
+    def __init__(self, parent):
+        super().__init__()
+        self.parent = parent
+
+    def add(self, groupName, name, value):
+        record('Attributes.add')
+        attribute = self.itemByName(groupName, name)
+        if attribute is None:
+            attribute = Attribute(self.parent, groupName, name)
+            self.items.append(attribute)
+        attribute.value = value
+        return attribute
+
+    def itemByName(self, groupName, name):
+        for attribute in self.items:
+            if (attribute.groupName, attribute.name) == (groupName, name):
+                return attribute
+        return None
+
+
+class Attribute:
+
+    def __init__(self, parent, groupName, name):
+        self.parent = parent
+        self.groupName = groupName
+        self.name = name
+        self.value = ''
+
+
+class ValueInput:
+
+    def __init__(self, value):
+        self.realValue = value
+
+    @staticmethod
+    def createByReal(value):
+        record('ValueInput.createByReal')
+        return ValueInput(value)
+
+
+class DialogResults:
+    DialogOK = 0
+    DialogCancel = 1
+
+
+class DocumentTypes:
+    FusionDesignDocumentType = 0
+
+
+class FileDialog:
+    # Filenames handed out by showOpen, queued up by the caller
+    queued = []
+
+    def __init__(self):
+        self.isMultiSelectEnabled = False
+        self.title = ''
+        self.filter = ''
+        self.filename = None
+
+    def showOpen(self):
+        record('FileDialog.showOpen')
+        if not FileDialog.queued:
+            return DialogResults.DialogCancel
+        self.filename = FileDialog.queued.pop(0)
+        return DialogResults.DialogOK
+
+
+class FolderDialog:
+    # Folders handed out by showDialog, queued up by the caller
+    queued = []
+
+    def __init__(self):
+        self.title = ''
+        self.folder = None
+
+    def showDialog(self):
+        record('FolderDialog.showDialog')
+        if not FolderDialog.queued:
+            return DialogResults.DialogCancel
+        self.folder = FolderDialog.queued.pop(0)
+        return DialogResults.DialogOK
+
+
+class UserInterface:
+
+    def __init__(self):
+        self.messages = []
+
+    def messageBox(self, text, *args):
+        record('UserInterface.messageBox')
+        self.messages.append(text)
+        return DialogResults.DialogOK
+
+    def createFileDialog(self):
+        return FileDialog()
+
+    def createFolderDialog(self):
+        return FolderDialog()
+
+
+class Document:
+
+    def __init__(self):
+        from . import fusion
+        self.design = fusion.Design()
+
+    @property
+    def products(self):
+        return ObjectCollection([self.design])
+
+
+class Documents(ObjectCollection):
+
+    def __init__(self, app):
+        super().__init__()
+        self.app = app
+
+    def add(self, documentType, visible=True, options=None):
+        record('Documents.add')
+        document = Document()
+        self.items.append(document)
+        self.app.activeDocument = document
+        return document
+
+
+class ImportManager:
+
+    def createSTEPImportOptions(self, filename):
+        return ImportOptions(filename)
+
+    def createFusionArchiveImportOptions(self, filename):
+        return ImportOptions(filename)
+
+    def importToTarget2(self, options, target):
+        record('ImportManager.importToTarget2')
+        from . import fusion
+        component = fusion.Component(options.filename)
+        component.bRepBodies.add(fusion.BRepBody(component))
+        return ObjectCollection([target.occurrences.addNewOccurrence(
+            component, Matrix3D())])
+
+
+class ImportOptions:
+
+    def __init__(self, filename):
+        self.filename = filename
+
+
+class Application:
+    _app = None
+
+    def __init__(self):
+        self.userInterface = UserInterface()
+        self.importManager = ImportManager()
+        self.documents = Documents(self)
+        self.activeDocument = None
+        self.documents.add(DocumentTypes.FusionDesignDocumentType)
+
+    @staticmethod
+    def get():
+        if Application._app is None:
+            Application._app = Application()
+        return Application._app
+
+    @property
+    def activeProduct(self):
+        return self.activeDocument.design
@@ -0,0 +1,542 @@
+import math
+from . import record
+from .core import Attributes, Matrix3D, ObjectCollection, Point3D, Vector3D
+
+
+class FeatureOperations:
+    JoinFeatureOperation = 0
+    CutFeatureOperation = 1
+    IntersectFeatureOperation = 2
+    NewBodyFeatureOperation = 3
+    NewComponentFeatureOperation = 4
+
+
+class ExtentDirections:
+    PositiveExtentDirection = 0
+    NegativeExtentDirection = 1
+    SymmetricExtentDirection = 2
+
+
+class PatternDistanceType:
+    ExtentPatternDistanceType = 0
+    SpacingPatternDistanceType = 1
+
+
+class ModelParameter:
+
+    def __init__(self, value):
+        self.value = value
+        self.expression = str(value)
+
+
+class DistanceExtentDefinition:
+
+    def __init__(self, distance):
+        self.distance = ModelParameter(distance.realValue)
+
+    @staticmethod
+    def create(distance):
+        return DistanceExtentDefinition(distance)
+
+
+class OffsetStartDefinition:
+
+    def __init__(self, offset):
+        self.offset = ModelParameter(offset.realValue)
+
+    @staticmethod
+    def create(offset):
+        return OffsetStartDefinition(offset)
+
+
+class ToEntityExtentDefinition:
+
+    def __init__(self, entity, isChained):
+        self.entity = entity
+        self.isChained = isChained
+        self.isMinimumSolution = True
+
+    @staticmethod
+    def create(entity, isChained, offset=None):
+        return ToEntityExtentDefinition(entity, isChained)
+
+
+class Design:
+
+    def __init__(self):
+        self.rootComponent = Component('root')
+        self.exportManager = ExportManager()
+
+    @staticmethod
+    def cast(product):
+        return product if isinstance(product, Design) else None
+
+    def findAttributes(self, groupName, attributeName):
+        record('Design.findAttributes')
+        root = self.rootComponent
+        components = []
+        for occurrence in root.occurrences:
+            if occurrence.component not in components:
+                components.append(occurrence.component)
+        found = []
+        for entity in list(root.sketches) + \
+                list(root.features.extrudeFeatures) + components:
+            attribute = entity.attributes.itemByName(groupName, attributeName)
+            if attribute is not None:
+                found.append(attribute)
+        return found
+
+
+class ExportManager:
+
+    def createFusionArchiveExportOptions(self, filename, geometry=None):
+        return ExportOptions(filename, geometry)
+
+    def execute(self, exportOptions):
+        # Only a marker file, enough for the archive to be found again
+        record('ExportManager.execute')
+        with open(exportOptions.filename, 'w') as fp:
+            fp.write(exportOptions.geometry.name)
+        return True
+
+
+class ExportOptions:
+
+    def __init__(self, filename, geometry):
+        self.filename = filename
+        self.geometry = geometry
+
+
+class Component:
+
+    def __init__(self, name):
+        self.name = name
+        self.attributes = Attributes(self)
+        self.sketches = Sketches()
+        self.features = Features(self)
+        self.occurrences = Occurrences()
+        self.bRepBodies = ObjectCollection()
+        self.xYConstructionPlane = ConstructionPlane('xy')
+        self.xConstructionAxis = ConstructionAxis((1, 0, 0))
+        self.yConstructionAxis = ConstructionAxis((0, 1, 0))
+
+
+class ConstructionPlane:
+
+    def __init__(self, name):
+        self.name = name
+
+
+class ConstructionAxis:
+
+    def __init__(self, direction):
+        self.direction = direction
+
+
+class Sketches(ObjectCollection):
+
+    def add(self, planarEntity):
+        record('Sketches.add')
+        sketch = Sketch(self)
+        self.items.append(sketch)
+        return sketch
+
+
+class Sketch:
+
+    def __init__(self, parent=None):
+        self.name = 'Sketch{}'.format(id(self))
+        self.parent = parent
+        self.attributes = Attributes(self)
+        self.transform = Matrix3D()
+        self.isComputeDeferred = False
+        self.sketchPoints = SketchPoints(self)
+        self.sketchCurves = SketchCurves(self)
+        # Every sketch starts with its origin point
+        self.sketchPoints.add(Point3D(0, 0, 0))
+
+    @property
+    def profiles(self):
+        record('Sketch.profiles')
+        return ObjectCollection(Profile(loop) for loop in self.loops())
+
+    def loops(self):
+        # One profile per closed, connected set of curves. Real Fusion also
+        # splits overlapping loops into separate regions, this doesn't.
+        parent = {}
+
+        def find(p):
+            while parent.setdefault(p, p) != p:
+                p = parent[p]
+            return p
+
+        def point_key(sketch_point):
+            g = sketch_point.geometry
+            return (round(g.x, 6), round(g.y, 6))
+
+        curves = self.sketchCurves.sketchLines.items + \
+            self.sketchCurves.sketchArcs.items
+        degree = {}
+        for curve in curves:
+            a = point_key(curve.startSketchPoint)
+            b = point_key(curve.endSketchPoint)
+            parent[find(a)] = find(b)
+            degree[a] = degree.get(a, 0) + 1
+            degree[b] = degree.get(b, 0) + 1
+        groups = {}
+        for curve in curves:
+            groups.setdefault(find(point_key(curve.startSketchPoint)),
+                              []).append(curve)
+        loops = []
+        for root, group in groups.items():
+            ends = [point_key(c.startSketchPoint) for c in group] + \
+                [point_key(c.endSketchPoint) for c in group]
+            if all(degree[p] >= 2 for p in ends):
+                loops.append(group)
+        # Circles are closed on their own
+        return loops + [[circle]
+                        for circle in self.sketchCurves.sketchCircles]
+
+    def move(self, entities, transform):
+        record('Sketch.move')
+        for entity in entities:
+            entity.transform_by(transform)
+        return True
+
+    def deleteMe(self):
+        record('Sketch.deleteMe')
+        self.parent.items.remove(self)
+        return True
+
+
+class SketchPoints(ObjectCollection):
+
+    def __init__(self, sketch):
+        super().__init__()
+        self.sketch = sketch
+
+    def add(self, point):
+        record('SketchPoints.add')
+        sketch_point = SketchPoint(point.copy())
+        self.items.append(sketch_point)
+        return sketch_point
+
+
+class SketchPoint:
+
+    def __init__(self, geometry):
+        self.geometry = geometry
+
+    def transform_by(self, transform):
+        self.geometry.transformBy(transform)
+
+
+class SketchCurves:
+
+    def __init__(self, sketch):
+        self.sketchLines = SketchLines(sketch)
+        self.sketchArcs = SketchArcs(sketch)
+        self.sketchCircles = SketchCircles(sketch)
+
+    def all(self):
+        return self.sketchLines.items + self.sketchArcs.items + \
+            self.sketchCircles.items
+
+    @property
+    def count(self):
+        return len(self.all())
+
+    def item(self, i):
+        return self.all()[i]
+
+
+def as_sketch_point(sketch, point):
+    if isinstance(point, SketchPoint):
+        return point
+    return sketch.sketchPoints.add(point)
+
+
+class SketchLines(ObjectCollection):
+
+    def __init__(self, sketch):
+        super().__init__()
+        self.sketch = sketch
+
+    def addByTwoPoints(self, startPoint, endPoint):
+        record('SketchLines.addByTwoPoints')
+        line = SketchLine(self.sketch,
+                          as_sketch_point(self.sketch, startPoint),
+                          as_sketch_point(self.sketch, endPoint))
+        self.items.append(line)
+        return line
+
+    def addCenterPointRectangle(self, centerPoint, cornerPoint):
+        record('SketchLines.addCenterPointRectangle')
+        dx = cornerPoint.x - centerPoint.x
+        dy = cornerPoint.y - centerPoint.y
+        corners = [as_sketch_point(self.sketch, Point3D(
+            centerPoint.x + sx * dx, centerPoint.y + sy * dy, 0))
+            for sx, sy in ((-1, -1), (1, -1), (1, 1), (-1, 1))]
+        lines = []
+        for i in range(4):
+            line = SketchLine(self.sketch, corners[i], corners[(i + 1) % 4])
+            self.items.append(line)
+            lines.append(line)
+        return ObjectCollection(lines)
+
+
+class SketchLine:
+
+    def __init__(self, sketch, start, end):
+        self.sketch = sketch
+        self.startSketchPoint = start
+        self.endSketchPoint = end
+
+    def deleteMe(self):
+        record('SketchLine.deleteMe')
+        self.sketch.sketchCurves.sketchLines.items.remove(self)
+        return True
+
+    def transform_by(self, transform):
+        self.startSketchPoint.geometry.transformBy(transform)
+        self.endSketchPoint.geometry.transformBy(transform)
+
+
+class SketchArcs(ObjectCollection):
+
+    def __init__(self, sketch):
+        super().__init__()
+        self.sketch = sketch
+
+    def addByCenterStartSweep(self, centerPoint, startPoint, sweepAngle):
+        record('SketchArcs.addByCenterStartSweep')
+        center = as_sketch_point(self.sketch, centerPoint)
+        start = as_sketch_point(self.sketch, startPoint)
+        c, s = start.geometry, center.geometry
+        radius = math.hypot(c.x - s.x, c.y - s.y)
+        angle = math.atan2(c.y - s.y, c.x - s.x) + sweepAngle
+        end = self.sketch.sketchPoints.add(Point3D(
+            s.x + radius * math.cos(angle), s.y + radius * math.sin(angle), 0))
+        arc = SketchArc(self.sketch, center, start, end, sweepAngle)
+        self.items.append(arc)
+        return arc
+
+
+class SketchArc:
+
+    def __init__(self, sketch, center, start, end, sweep):
+        self.sketch = sketch
+        self.centerSketchPoint = center
+        self.startSketchPoint = start
+        self.endSketchPoint = end
+        self.sweep = sweep
+
+    def deleteMe(self):
+        record('SketchArc.deleteMe')
+        self.sketch.sketchCurves.sketchArcs.items.remove(self)
+        return True
+
+    def transform_by(self, transform):
+        for point in (self.centerSketchPoint, self.startSketchPoint,
+                      self.endSketchPoint):
+            point.geometry.transformBy(transform)
+
+
+class SketchCircles(ObjectCollection):
+
+    def __init__(self, sketch):
+        super().__init__()
+        self.sketch = sketch
+
+    def addByCenterRadius(self, centerPoint, radius):
+        record('SketchCircles.addByCenterRadius')
+        circle = SketchCircle(self.sketch,
+                              as_sketch_point(self.sketch, centerPoint),
+                              radius)
+        self.items.append(circle)
+        return circle
+
+
+class SketchCircle:
+
+    def __init__(self, sketch, center, radius):
+        self.sketch = sketch
+        self.centerSketchPoint = center
+        self.radius = radius
+
+    def deleteMe(self):
+        record('SketchCircle.deleteMe')
+        self.sketch.sketchCurves.sketchCircles.items.remove(self)
+        return True
+
+    def transform_by(self, transform):
+        self.centerSketchPoint.geometry.transformBy(transform)
+
+
+class Profile:
+
+    def __init__(self, curves):
+        self.curves = curves
+
+
+class Features:
+
+    def __init__(self, component):
+        self.extrudeFeatures = ExtrudeFeatures(component)
+        self.moveFeatures = MoveFeatures()
+        self.rectangularPatternFeatures = RectangularPatternFeatures(
+            component)
+
+
+class ExtrudeFeatures(ObjectCollection):
+
+    def __init__(self, component):
+        super().__init__()
+        self.component = component
+
+    def createInput(self, profile, operation):
+        record('ExtrudeFeatures.createInput')
+        return ExtrudeInput(profile, operation)
+
+    def add(self, input):
+        record('ExtrudeFeatures.add')
+        feature = ExtrudeFeature(self, input)
+        if input.operation == FeatureOperations.NewBodyFeatureOperation:
+            body = BRepBody(self.component, feature)
+            self.component.bRepBodies.add(body)
+            feature.bodies.add(body)
+        elif input.operation == FeatureOperations.CutFeatureOperation:
+            body = input.extentOne.entity
+            body.cuts.append(feature)
+            feature.bodies.add(body)
+        self.items.append(feature)
+        return feature
+
+
+class ExtrudeInput:
+
+    def __init__(self, profile, operation):
+        self.profile = profile
+        self.operation = operation
+        self.extentOne = None
+        self.direction = None
+        self.startExtent = None
+
+    def setOneSideExtent(self, extent, direction, taperAngle=None):
+        self.extentOne = extent
+        self.direction = direction
+        return True
+
+
+class ExtrudeFeature:
+
+    def __init__(self, parent, input):
+        self.parent = parent
+        self.profile = input.profile
+        self.operation = input.operation
+        self.extentOne = input.extentOne
+        self.startExtent = input.startExtent
+        self.bodies = ObjectCollection()
+        self.attributes = Attributes(self)
+
+    def deleteMe(self):
+        # Deleting a new body extrude deletes its body, deleting a cut
+        # leaves the body uncut
+        record('ExtrudeFeature.deleteMe')
+        for body in self.bodies:
+            if self.operation == FeatureOperations.NewBodyFeatureOperation:
+                self.parent.component.bRepBodies.items.remove(body)
+            else:
+                body.cuts.remove(self)
+        self.parent.items.remove(self)
+        return True
+
+
+class BRepBody:
+
+    def __init__(self, component, feature=None):
+        self.name = ''
+        self.parentComponent = component
+        self.feature = feature
+        self.cuts = []
+
+
+class MoveFeatures(ObjectCollection):
+
+    def createInput(self, inputEntities, transform):
+        record('MoveFeatures.createInput')
+        return MoveInput(inputEntities, transform)
+
+    def add(self, input):
+        record('MoveFeatures.add')
+        self.items.append(input)
+        return input
+
+
+class MoveInput:
+
+    def __init__(self, inputEntities, transform):
+        self.inputEntities = inputEntities
+        self.transform = transform
+
+
+class RectangularPatternFeatures(ObjectCollection):
+
+    def __init__(self, component):
+        super().__init__()
+        self.component = component
+
+    def createInput(self, inputEntities, directionOneEntity, quantityOne,
+                    distanceOne, patternDistanceType):
+        record('RectangularPatternFeatures.createInput')
+        return PatternInput(inputEntities, directionOneEntity,
+                            quantityOne, distanceOne)
+
+    def add(self, input):
+        record('RectangularPatternFeatures.add')
+        dx, dy, dz = input.direction.direction
+        quantity = int(round(input.quantity.realValue))
+        distance = input.distance.realValue
+        for occ in input.inputEntities:
+            for i in range(1, quantity):
+                transform = occ.transform.copy()
+                transform.translation = Vector3D(
+                    transform.translation.x + dx * distance * i,
+                    transform.translation.y + dy * distance * i,
+                    transform.translation.z + dz * distance * i)
+                self.component.occurrences.addNewOccurrence(
+                    occ.component, transform)
+        self.items.append(input)
+        return input
+
+
+class PatternInput:
+
+    def __init__(self, inputEntities, direction, quantity, distance):
+        self.inputEntities = inputEntities
+        self.direction = direction
+        self.quantity = quantity
+        self.distance = distance
+
+
+class Occurrences(ObjectCollection):
+
+    def addExistingComponent(self, component, transform):
+        record('Occurrences.addExistingComponent')
+        return self.addNewOccurrence(component, transform)
+
+    def addNewOccurrence(self, component, transform):
+        occurrence = Occurrence(component, transform.copy())
+        self.items.append(occurrence)
+        return occurrence
+
+
+class Occurrence:
+
+    def __init__(self, component, transform):
+        self.component = component
+        self.transform = transform
+
+    @property
+    def bRepBodies(self):
+        return self.component.bRepBodies
@@ -1,46 +1,68 @@
 
 import math
-import traceback
 import adsk.core
 import adsk.fusion
 from .. import ui_commands
 from .. import Config
-
-PLATE_HEIGHT = Config.BOTTOM_THICKNESS + Config.MID_THICKNESS_1 + \
-    Config.MID_THICKNESS_0 + Config.PLATE_THICKNESS
+from .. import KLE
+from .. import Layout
+from .. import Library
+from .. import Stack
+from .. import Trace
 
 
 def place_switches(keys):
-    orig_switch = import_switch_model().item(0)
-    fix_first_switch(orig_switch, keys[0])
-
-    badtrans = adsk.core.Matrix3D.create()
-    rotZ = adsk.core.Matrix3D.create()
-    rotZ.setToRotation(
-        keys[0]["rotation_angle"],
-        adsk.core.Vector3D.create(
-            0, 0, 1
-        ),
-        adsk.core.Point3D.create(
-            keys[0]["rotation_x"], keys[0]["rotation_y"], 0)
-    )
-
-    badtrans.translation = adsk.core.Vector3D.create(
-        badtrans.translation.x + keys[0]["x"] + 0.7375,
-        badtrans.translation.y + keys[0]["y"] + 0.7375,
-        badtrans.translation.z + 0.1 + PLATE_HEIGHT)
-    badtrans.transformBy(rotZ)
-    for key in keys[1:]:
-        add_switch(orig_switch, key, badtrans)
-
-
-def fix_first_switch(switch, key):
     app = adsk.core.Application.get()
     design = adsk.fusion.Design.cast(app.activeProduct)
     rootComp = design.rootComponent
-    switch_collection = adsk.core.ObjectCollection.create()
-    for i in range(switch.bRepBodies.count):
-        switch_collection.add(switch.bRepBodies.item(i))
+
+    model = switch_model(keys)
+    component, first = switch_component(design, model)
+    # Every transform is computed up front, relative to the first switch
+    world = Layout.world_placements(keys, model['offset'], model['offset'])
+    base = matrix(world[0],
+                  Stack.plate_height(Stack.layers()) + model['height'])
+    if first is None:
+        first = add_switch(rootComp, component, (0, 0, 0), base)
+    else:
+        first.transform = base
+
+    transforms = Layout.relative_placements(world)
+    for run in Layout.pattern_runs(keys, transforms):
+        occ = add_switch(rootComp, component, transforms[run[0]], base)
+        if len(run) > 1:
+            pitch = transforms[run[1]][1] - transforms[run[0]][1]
+            pattern_switch(rootComp, occ, len(run), pitch)
+
+
+def switch_model(keys):
+    # The model for the layout's switch type, from its metadata or the
+    # default one
+    switch_type = KLE.switch_type(keys)
+    if switch_type not in Config.SWITCH_MODELS:
+        raise ValueError(
+            'The layout uses {} switches, add a model for them to '
+            'SWITCH_MODELS'.format(switch_type))
+    return dict(Config.SWITCH_MODELS[switch_type], type=switch_type)
+
+
+def switch_component(design, model):
+    # The switch model as a component, stood upright once when it is first
+    # imported. Returns the component and the occurrence an import created,
+    # if any. The user is only asked for the STEP file when there is no
+    # stored model of this type.
+    step_file = model['file'] or Config.SWITCH_FILE or \
+        prompt_switch_file_select
+    return Library.get_component(design, 'switch-' + model['type'],
+                                 step_file, 'switch-upright', normalize)
+
+
+def normalize(component):
+    # Stand the STEP model upright inside its own component. Change the
+    # library variant above whenever this changes.
+    bodies = adsk.core.ObjectCollection.create()
+    for i in range(component.bRepBodies.count):
+        bodies.add(component.bRepBodies.item(i))
     trans = adsk.core.Matrix3D.create()
     rotY = adsk.core.Matrix3D.create()
     rotY.setToRotation(
@@ -60,70 +82,43 @@ def fix_first_switch(switch, key):
         adsk.core.Point3D.create(0, 0, 0)
     )
     trans.transformBy(rotX)
-    rotZ = adsk.core.Matrix3D.create()
-    rotZ.setToRotation(
-        key["rotation_angle"],
-        adsk.core.Vector3D.create(
-            0, 0, 1
-        ),
-        adsk.core.Point3D.create(
-            key["rotation_x"], key["rotation_y"], 0)
-    )
-
-    trans.translation = adsk.core.Vector3D.create(
-        trans.translation.x + key["x"] + 0.7375,
-        trans.translation.y + key["y"] + 0.7375,
-        trans.translation.z + 0.1 + PLATE_HEIGHT)
-    trans.transformBy(rotZ)
-    moveInput = rootComp.features.moveFeatures.createInput(
-        switch_collection, trans)
-    rootComp.features.moveFeatures.add(moveInput)
-
-
-def add_switch(occ, key, badtrans):
-    app = adsk.core.Application.get()
-    design = adsk.fusion.Design.cast(app.activeProduct)
-    rootComp = design.rootComponent
-    trans = occ.transform.copy()
-    goodtrans = badtrans.copy()
-    goodtrans.invert()
-    trans.transformBy(goodtrans)
-    rotZ = adsk.core.Matrix3D.create()
-    rotZ.setToRotation(
-        key["rotation_angle"],
-        adsk.core.Vector3D.create(
-            0, 0, 1
-        ),
-        adsk.core.Point3D.create(
-            key["rotation_x"], key["rotation_y"], 0)
-    )
-    trans.translation = adsk.core.Vector3D.create(
-        trans.translation.x + key["x"] + 0.7375,
-        trans.translation.y + key["y"] + 0.7375,
-        trans.translation.z + 0.1 + PLATE_HEIGHT)
-    trans.transformBy(rotZ)
-    newOcc = rootComp.occurrences.addExistingComponent(
-        occ.component, trans)
-    newOcc.transform = trans
-    return
-
-
-def import_switch_model():
-    app = adsk.core.Application.get()
-    ui = app.userInterface
-    design = app.activeProduct
-    rootComp = design.rootComponent
-    try:
-
-        # Import a selected STEP file into the root component
-        stepImportOptions = app.importManager.createSTEPImportOptions(
-            prompt_switch_file_select()
-        )
-        # this version of the method returns the imported model ref
-        return app.importManager.importToTarget2(stepImportOptions, rootComp)
-    except:
-        if ui:
-            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+    moveInput = component.features.moveFeatures.createInput(bodies, trans)
+    component.features.moveFeatures.add(moveInput)
+    Trace.count('move')
+
+
+def add_switch(rootComp, component, transform, base):
+    trans = base.copy()
+    trans.transformBy(matrix(transform))
+    Trace.count('occurrence')
+    return rootComp.occurrences.addExistingComponent(component, trans)
+
+
+def pattern_switch(rootComp, occ, quantity, pitch):
+    # Repeat a placed switch along x for a whole row at once
+    entities = adsk.core.ObjectCollection.create()
+    entities.add(occ)
+    patterns = rootComp.features.rectangularPatternFeatures
+    patternInput = patterns.createInput(
+        entities, rootComp.xConstructionAxis,
+        adsk.core.ValueInput.createByReal(quantity),
+        adsk.core.ValueInput.createByReal(pitch),
+        adsk.fusion.PatternDistanceType.SpacingPatternDistanceType)
+    Trace.count('pattern')
+    return patterns.add(patternInput)
+
+
+def matrix(transform, tz=0):
+    # Planar (angle, tx, ty) transform as a Matrix3D, raised by tz
+    ng, tx, ty = transform
+    c = math.cos(ng)
+    s = math.sin(ng)
+    mat = adsk.core.Matrix3D.create()
+    mat.setWithArray([c, -s, 0, tx,
+                      s, c, 0, ty,
+                      0, 0, 1, tz,
+                      0, 0, 0, 1])
+    return mat
 
 
 def prompt_switch_file_select():
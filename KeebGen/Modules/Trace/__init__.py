@@ -0,0 +1,134 @@
+import collections
+import contextlib
+import functools
+import json
+import os
+import time
+import tracemalloc
+from .. import Cache
+from .. import Config
+
+
+# Opt-in (Config.TRACE) instrumentation of a generation run. Stages record
+# wall time, the Fusion API work done inside them (sketch entities, move
+# and extrude features, ...) and Python memory, and are written out as a
+# Chrome trace (open it in chrome://tracing or https://ui.perfetto.dev).
+
+events = []
+counters = collections.Counter()
+cache = {}
+_started = None
+_cache_before = None
+# Highest traced memory of each open stage (the whole run first) from
+# before their nested stages last reset the peak
+_peaks = []
+
+
+def enabled():
+    return Config.TRACE and _started is not None
+
+
+def start():
+    global _started, _cache_before
+    del events[:]
+    counters.clear()
+    cache.clear()
+    if Config.TRACE:
+        tracemalloc.start()
+        _peaks[:] = [0]
+        _cache_before = Cache.stats()
+        _started = time.perf_counter()
+
+
+def count(name, amount=1):
+    # Called wherever API work worth tracking happens
+    if enabled():
+        counters[name] += amount
+
+
+@contextlib.contextmanager
+def stage(name):
+    if not enabled():
+        yield
+        return
+    before = counters.copy()
+    # Each stage measures its own peak, so the peak is reset once the
+    # enclosing stages have taken it into account
+    memory_before, peak = tracemalloc.get_traced_memory()
+    _peaks[:] = [max(outer, peak) for outer in _peaks]
+    tracemalloc.reset_peak()
+    _peaks.append(0)
+    begin = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        memory, peak = tracemalloc.get_traced_memory()
+        peak = max(peak, _peaks.pop())
+        args = dict(counters - before)
+        args['memory_kb'] = (memory - memory_before) // 1024
+        args['peak_memory_kb'] = peak // 1024
+        events.append(dict(name=name, cat=name.split('.')[0], ph='X',
+                           ts=(begin - _started) * 1e6,
+                           dur=(end - begin) * 1e6, pid=1, tid=1,
+                           args=args))
+
+
+def timed(name):
+    # Decorator version of stage. Sketch builders also count the entities
+    # in the sketch they return.
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled():
+                return func(*args, **kwargs)
+            with stage(name):
+                result = func(*args, **kwargs)
+                curves = getattr(result, 'sketchCurves', None)
+                if curves is not None:
+                    count('sketch_entities', curves.count)
+            return result
+        return wrapper
+    return decorator
+
+
+def finish(file_name):
+    """Write the trace next to the KLE file (or to Config.TRACE_FILE)"""
+    global _started
+    if not enabled():
+        return
+    peak = max(tracemalloc.get_traced_memory()[1], _peaks.pop())
+    tracemalloc.stop()
+    _started = None
+    cache.update(Cache.stats_since(_cache_before))
+    path = Config.TRACE_FILE or \
+        os.path.splitext(file_name)[0] + '-trace.json'
+    with open(path, 'w') as fp:
+        json.dump(dict(traceEvents=events, displayTimeUnit='ms',
+                       otherData=dict(layout=file_name,
+                                      peak_memory_kb=peak // 1024,
+                                      totals=dict(counters),
+                                      cache=cache)), fp, indent=1)
+    return path
+
+
+def summary():
+    # Top level stages first, with their nested stages indented below
+    lines = []
+    for event in sorted(events, key=lambda e: (e['ts'], -e['dur'])):
+        depth = sum(1 for other in events if other is not event and
+                    other['ts'] <= event['ts'] and
+                    other['ts'] + other['dur'] >= event['ts'] + event['dur'])
+        args = ', '.join('{} {}'.format(v, k) for k, v in
+                         sorted(event['args'].items())
+                         if k not in ('memory_kb', 'peak_memory_kb') and v)
+        lines.append('{}{}: {:.2f}s{}'.format(
+            '    ' * depth, event['name'], event['dur'] / 1e6,
+            ' ({})'.format(args) if args else ''))
+    if events:
+        lines.append('')
+        lines.append('Peak Python memory: {} KB'.format(
+            max(event['args']['peak_memory_kb'] for event in events)))
+    if cache:
+        lines.append(Cache.describe(cache))
+    return '\n'.join(lines)
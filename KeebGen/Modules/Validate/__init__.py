@@ -0,0 +1,150 @@
+import math
+from .. import Config
+from .. import Geometry
+from .. import Layout
+
+
+# Layout checks that run on the normalized keys, before any Fusion work.
+# Neighbouring keys are found through a grid index over the key bounds, so
+# only nearby pairs are ever compared.
+
+# Tolerance for keys that merely touch, in cm
+TOUCHING = 1e-4
+# Keycaps are about 18.1 mm across on the 19.05 mm grid, so neighbouring
+# key footprints can overlap by this much before the caps collide
+KEYCAP_GAP = 0.095
+
+
+class LayoutError(ValueError):
+    """The layout can't be built, the message lists every problem"""
+
+
+def check(keys):
+    """Problems with the layout as readable strings, empty if it is fine"""
+    problems = invalid_keys(keys)
+    if problems:
+        # The geometry checks need sane numbers to work with
+        return problems
+    problems.extend(overlapping_keys(keys))
+    problems.extend(thin_webs(keys))
+    return problems
+
+
+def validate(keys):
+    problems = check(keys)
+    if problems:
+        shown = problems[:20]
+        if len(problems) > len(shown):
+            shown.append('... and {} more'.format(len(problems) - len(shown)))
+        raise LayoutError('The layout has {} problem(s):\n{}'.format(
+            len(problems), '\n'.join(shown)))
+
+
+def invalid_keys(keys):
+    not_numbers = set()
+    for column in keys.columns().values():
+        not_numbers.update(i for i, value in enumerate(column)
+                           if not math.isfinite(value))
+    problems = []
+    for i in range(len(keys)):
+        if i in not_numbers:
+            problems.append('Key {} has a position or size that is not a '
+                            'number'.format(i + 1))
+        elif min(keys.width[i], keys.height[i],
+                 keys.width2[i], keys.height2[i]) <= 0:
+            problems.append('Key {} has no width or height'.format(i + 1))
+    return problems
+
+
+def overlapping_keys(keys):
+    # Keycaps that overlap, rather than just touch
+    inset = KEYCAP_GAP / 2
+    footprints = Layout.rectangles(keys, keys.x, keys.y,
+                                   [w / 2 - inset for w in keys.width],
+                                   [h / 2 - inset for h in keys.height])
+    owners = list(range(len(keys)))
+    shaped = [i for i in range(len(keys)) if Layout.shaped_key(keys, i)]
+    if shaped:
+        second = Layout.rectangles(keys, keys.x2, keys.y2,
+                                   [w / 2 - inset for w in keys.width2],
+                                   [h / 2 - inset for h in keys.height2])
+        footprints.extend(second[i] for i in shaped)
+        owners.extend(shaped)
+    problems = []
+    reported = set()
+    for a, b in neighbours(footprints, 0):
+        pair = (owners[a], owners[b])
+        if pair[0] == pair[1] or pair in reported:
+            continue
+        depth = overlap(footprints[a], footprints[b])
+        if depth > TOUCHING:
+            reported.add(pair)
+            problems.append('Keycaps {} and {} overlap by {:.2f} mm'.format(
+                pair[0] + 1, pair[1] + 1, depth * 10))
+    return problems
+
+
+def thin_webs(keys):
+    # Switch cutouts closer together than the plate can hold up
+    cutouts = Layout.switch_cutouts(keys)
+    web = Config.MIN_WEB_THICKNESS
+    problems = []
+    for a, b in neighbours(cutouts, web):
+        gap = distance(cutouts[a], cutouts[b])
+        if gap < web - TOUCHING:
+            problems.append(
+                'Switch cutouts {} and {} leave {:.2f} mm of plate, '
+                'less than {:.2f} mm'.format(a + 1, b + 1, gap * 10,
+                                             web * 10))
+    return problems
+
+
+def neighbours(polygons, margin):
+    # Pairs (a, b), a < b, whose bounds are within margin of each other
+    boxes = [Geometry.bounds(polygon) for polygon in polygons]
+    index = Geometry.GridIndex(boxes)
+    for a, box in enumerate(boxes):
+        grown = (box[0] - margin, box[1] - margin,
+                 box[2] + margin, box[3] + margin)
+        for b in index.query(grown):
+            if b > a:
+                yield a, b
+
+
+def axes(polygon):
+    count = len(polygon)
+    for i in range(count):
+        x0, y0 = polygon[i]
+        x1, y1 = polygon[(i + 1) % count]
+        length = math.hypot(x1 - x0, y1 - y0)
+        yield (y0 - y1) / length, (x1 - x0) / length
+
+
+def overlap(a, b):
+    # Separating axis test for convex polygons: how far they overlap, zero
+    # or less if they don't
+    depth = float('inf')
+    for nx, ny in list(axes(a)) + list(axes(b)):
+        pa = [x * nx + y * ny for x, y in a]
+        pb = [x * nx + y * ny for x, y in b]
+        depth = min(depth, min(max(pa), max(pb)) - max(min(pa), min(pb)))
+        if depth <= 0:
+            break
+    return depth
+
+
+def distance(a, b):
+    # Shortest distance between two convex polygons
+    if overlap(a, b) > 0:
+        return 0
+    return min(min(point_segment(p, q0, q1)
+                   for p in polygon
+                   for q0, q1 in zip(other, other[1:] + other[:1]))
+               for polygon, other in ((a, b), (b, a)))
+
+
+def point_segment(p, a, b):
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    t = ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / (dx * dx + dy * dy)
+    t = max(0, min(1, t))
+    return math.hypot(p[0] - a[0] - t * dx, p[1] - a[1] - t * dy)
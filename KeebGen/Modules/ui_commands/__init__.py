@@ -16,3 +16,17 @@ def file_select(title, filter):
         return fileDlg.filename
     else:
         raise FileNotFoundError
+
+
+def folder_select(title):
+    app = adsk.core.Application.get()
+    ui = app.userInterface
+    folderDlg = ui.createFolderDialog()
+    folderDlg.title = title
+
+    # Show folder dialog
+    dlgResult = folderDlg.showDialog()
+    if dlgResult == adsk.core.DialogResults.DialogOK:
+        return folderDlg.folder
+    else:
+        raise FileNotFoundError
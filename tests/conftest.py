@@ -0,0 +1,18 @@
+import os
+import sys
+import pytest
+
+# KeebGen is imported from the repository root, as the modules' own
+# `python -m KeebGen.Modules...` entry points do
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from KeebGen.Modules import Config
+from KeebGen.Modules import Standin
+
+
+@pytest.fixture
+def app(monkeypatch):
+    # A fresh stand-in application, with layouts always parsed from scratch
+    Standin.install()
+    monkeypatch.setattr(Config, 'USE_CACHE', False)
+    return Standin.reset()
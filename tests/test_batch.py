@@ -0,0 +1,49 @@
+import json
+import os
+import shutil
+from KeebGen.Modules import Config
+from KeebGen.Modules import Harness
+
+
+def bodies(document):
+    return [body.name for body in document.design.rootComponent.bRepBodies]
+
+
+def test_batch_builds_each_layout_in_its_own_design(app, tmp_path):
+    from KeebGen import KeebGen
+    from KeebGen.Modules import Batch
+    for name in ('jd40.json', 'atreus.json'):
+        shutil.copy(os.path.join(Harness.SAMPLE_DATA, name), str(tmp_path))
+    results = Batch.run_batch(str(tmp_path), KeebGen.main)
+    assert [r['error'] for r in results] == [None, None]
+    # The empty design the application started with, and one per layout
+    assert app.documents.count == 3
+    assert app.activeDocument is app.documents.item(2)
+    for document in (app.documents.item(1), app.documents.item(2)):
+        assert len(bodies(document)) == 6
+    assert bodies(app.documents.item(0)) == []
+    assert '2 built, 0 failed' in app.userInterface.messages[-1]
+
+
+def test_batch_manifest_reports_failures_and_restores_config(app, tmp_path):
+    from KeebGen import KeebGen
+    from KeebGen.Modules import Batch
+    shutil.copy(os.path.join(Harness.SAMPLE_DATA, 'jd40.json'),
+                str(tmp_path))
+    (tmp_path / 'broken.json').write_text('[["a"]')
+    manifest = tmp_path / 'batch.json'
+    manifest.write_text(json.dumps(dict(
+        layouts=['broken.json', 'jd40.json'],
+        config=dict(PLATE_THICKNESS=0.5))))
+    thicknesses = []
+
+    def build(file_name):
+        thicknesses.append(Config.PLATE_THICKNESS)
+        KeebGen.main(file_name)
+
+    results = Batch.run_batch(str(manifest), build)
+    assert 'ValueError' in results[0]['error']
+    assert results[1]['error'] is None
+    assert thicknesses == [0.5, 0.5]
+    assert Config.PLATE_THICKNESS == 0.3
+    assert '1 built, 1 failed' in app.userInterface.messages[-1]
@@ -0,0 +1,66 @@
+import os
+import pytest
+from KeebGen.Modules import Cache
+from KeebGen.Modules import Config
+from KeebGen.Modules import KLE
+
+
+def keys():
+    keys = KLE.deserialize([{'name': 'test'}, ['a', {'w': 2}, 'b']])
+    keys.offset()
+    keys.scale(Config.KEY_UNIT)
+    return keys
+
+
+def test_round_trip():
+    columns, meta = Cache.decode(Cache.encode(keys()))
+    assert KLE.KeyTable(columns, meta).columns() == keys().columns()
+    assert meta == {'name': 'test'}
+
+
+@pytest.mark.parametrize('data', [
+    b'', b'KGC2', b'KGC2\x01', b'KGC2\x02\x00\x00\x00{', b'nope' * 4,
+    b'KGC2\x02\x00\x00\x00[]', b'KGC2\x02\x00\x00\x00{}',
+    Cache.encode(keys())[:-1]])
+def test_unreadable_entries_are_misses(data):
+    assert Cache.decode(data) is None
+
+
+def test_eviction_keeps_the_most_recently_used(tmp_path):
+    cache = Cache.LayoutCache(str(tmp_path), 2)
+    for i, digest in enumerate(('a', 'b')):
+        cache.store(digest, keys())
+        os.utime(cache.path(digest), (1000 + i, 1000 + i))
+    # Loading a refreshes it, so b is now the oldest
+    assert cache.load('a') is not None
+    cache.store('c', keys())
+    assert sorted(os.listdir(str(tmp_path))) == ['a.keys', 'c.keys']
+    assert cache.load('b') is None
+    assert cache.stats() == dict(hits=1, misses=1)
+
+
+def test_unwritable_cache_is_a_miss(tmp_path, monkeypatch):
+    # The cache directory can't be created under a file
+    (tmp_path / 'file').write_text('')
+    monkeypatch.setattr(Config, 'USE_CACHE', True)
+    monkeypatch.setattr(Config, 'CACHE_DIR', str(tmp_path / 'file' / 'c'))
+    layout = tmp_path / 'layout.json'
+    layout.write_text('[["a", "b"]]')
+    before = Cache.stats()
+    for _ in range(2):
+        assert len(KLE.get_keys(str(layout))) == 2
+    assert Cache.stats_since(before) == dict(hits=0, misses=2)
+
+
+def test_get_keys_counts_hits_and_misses(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'USE_CACHE', True)
+    monkeypatch.setattr(Config, 'CACHE_DIR', str(tmp_path / 'cache'))
+    layout = tmp_path / 'layout.json'
+    layout.write_text('[["a", "b"]]')
+    before = Cache.stats()
+    first = KLE.get_keys(str(layout))
+    second = KLE.get_keys(str(layout))
+    assert first.columns() == second.columns()
+    assert Cache.stats_since(before) == dict(hits=1, misses=1)
+    assert Cache.describe(Cache.stats_since(before)) == \
+        'Layout cache: 1 hit(s), 1 miss(es)'
@@ -0,0 +1,97 @@
+import pytest
+from KeebGen.Modules import Config
+from KeebGen.Modules import Cutouts
+from KeebGen.Modules import KLE
+from KeebGen.Modules import Layout
+
+
+def size(polygon):
+    xs, ys = zip(*polygon)
+    return (round(max(xs) - min(xs), 6), round(max(ys) - min(ys), 6))
+
+
+def center(polygon):
+    xs, ys = zip(*polygon)
+    return (round((max(xs) + min(xs)) / 2, 6),
+            round((max(ys) + min(ys)) / 2, 6))
+
+
+def area(polygon):
+    # Positive for counter-clockwise polygons
+    pairs = zip(polygon, polygon[1:] + polygon[:1])
+    return sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in pairs) / 2
+
+
+def layout(rows):
+    # Keys in design units, as get_keys returns them
+    keys = KLE.deserialize(rows)
+    keys.offset()
+    keys.scale(Config.KEY_UNIT)
+    return keys
+
+
+@pytest.mark.parametrize('style, expected', [
+    ('mx', (1.4, 1.4)), ('alps', (1.55, 1.28)), ('choc', (1.38, 1.38))])
+def test_switch_hole(style, expected):
+    hole, = Cutouts.switch_hole(style)
+    assert size(hole) == expected
+    assert center(hole) == (0, 0)
+    assert area(hole) > 0
+
+
+def test_mx_hole_follows_switch_diameter(monkeypatch):
+    monkeypatch.setattr(Config, 'SWITCH_DIAMETER', 1.5)
+    hole, = Cutouts.switch_hole('mx')
+    assert size(hole) == (1.5, 1.5)
+
+
+def test_unknown_switch_hole():
+    with pytest.raises(ValueError, match='topre'):
+        Cutouts.switch_hole('topre')
+
+
+def test_layout_switch_type_picks_the_hole(monkeypatch):
+    keys = layout([{'switchMount': 'alps'}, ['a', 'b']])
+    holes = Layout.switch_cutouts(keys)
+    assert [size(hole) for hole in holes] == [(1.55, 1.28)] * 2
+    assert [center(hole) for hole in holes] == [
+        (round(keys.x[i], 6), round(keys.y[i], 6)) for i in range(2)]
+    monkeypatch.setattr(Config, 'SWITCH_CUTOUT', 'choc')
+    assert size(Layout.switch_cutouts(keys)[0]) == (1.38, 1.38)
+
+
+@pytest.mark.parametrize('kind, expected', [
+    ('cherry', (0.665, 1.23)), ('costar', (0.33, 1.4))])
+def test_stabilizer_slots(kind, expected):
+    unit = Config.KEY_UNIT
+    width, height, drop = Cutouts.STABILIZER_SLOTS[kind]
+    slots = Cutouts.stabilizer(2 * unit, unit, kind)
+    assert [size(slot) for slot in slots] == [expected] * 2
+    assert [center(slot) for slot in slots] == [
+        (-1.1938, -drop), (1.1938, -drop)]
+    assert all(area(slot) > 0 for slot in slots)
+
+
+def test_vertical_stabilizer_slots_are_turned():
+    unit = Config.KEY_UNIT
+    slots = Cutouts.stabilizer(unit, 2 * unit, 'cherry')
+    assert [size(slot) for slot in slots] == [(1.23, 0.665)] * 2
+    assert [center(slot) for slot in slots] == [
+        (0.06, -1.1938), (0.06, 1.1938)]
+    assert all(area(slot) > 0 for slot in slots)
+
+
+def test_stabilizer_sizes():
+    unit = Config.KEY_UNIT
+
+    def spacing(units):
+        slots = Cutouts.stabilizer(units * unit, unit, 'cherry')
+        return center(slots[1])[0] if slots else None
+
+    assert spacing(1.75) is None
+    assert spacing(2.5) == 1.1938
+    assert spacing(6.25) == 5.0
+    assert spacing(7) == 5.715
+    assert Cutouts.stabilizer(2 * unit, unit, '') == ()
+    with pytest.raises(ValueError, match='gmk'):
+        Cutouts.stabilizer(2 * unit, unit, 'gmk')
@@ -0,0 +1,109 @@
+import collections
+import json
+import math
+import os
+import xml.etree.ElementTree
+import pytest
+from KeebGen.Modules import Config
+from KeebGen.Modules import Export
+
+
+def test_parallel_sweep_larger_than_cache(tmp_path, monkeypatch):
+    # Workers share one on-disk cache and evict from it concurrently
+    layouts = tmp_path / 'layouts'
+    layouts.mkdir()
+    for i in range(200):
+        rows = [['k'] * (1 + i % 12) for _ in range(1 + i // 12)]
+        (layouts / '{:03}.json'.format(i)).write_text(json.dumps(rows))
+    monkeypatch.setattr(Config, 'USE_CACHE', True)
+    monkeypatch.setattr(Config, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(Config, 'CACHE_SIZE', 10)
+    results, seconds = Export.export_files(
+        Export.expand([str(layouts)]), str(tmp_path / 'out'), ('dxf',),
+        workers=8)
+    assert [r['error'] for r in results if r['error']] == []
+    assert len(list((tmp_path / 'cache').glob('*.keys'))) <= 10
+    assert not list((tmp_path / 'cache').glob('*.tmp'))
+
+
+def jd40_keys(monkeypatch):
+    from KeebGen.Modules import Harness
+    from KeebGen.Modules import KLE
+    monkeypatch.setattr(Config, 'USE_CACHE', False)
+    return KLE.get_keys(os.path.join(Harness.SAMPLE_DATA, 'jd40.json'))
+
+
+def dxf_entities(path):
+    # (type, {group code: value}) for every entity of a DXF file
+    with open(path) as fp:
+        lines = fp.read().splitlines()
+    pairs = list(zip(lines[::2], lines[1::2]))
+    start = pairs.index(('2', 'ENTITIES')) + 1
+    entities = []
+    for code, value in pairs[start:]:
+        if code == '0':
+            entities.append((value, {}))
+        else:
+            entities[-1][1][code] = value
+    assert entities[-2:] == [('ENDSEC', {}), ('EOF', {})]
+    return pairs, entities[:-2]
+
+
+def endpoints(kind, values):
+    x, y = float(values['10']), float(values['20'])
+    if kind == 'LINE':
+        return [(x, y), (float(values['11']), float(values['21']))]
+    r = float(values['40'])
+    return [(x + r * math.cos(math.radians(float(values[code]))),
+             y + r * math.sin(math.radians(float(values[code]))))
+            for code in ('50', '51')]
+
+
+def test_dxf_layers_are_closed_loops_in_mm(tmp_path, monkeypatch):
+    keys = jd40_keys(monkeypatch)
+    monkeypatch.setattr(Config, 'SCREW_HOLES', 4)
+    geometry = Export.layer_geometry(keys)
+    Export.export_layout(keys, str(tmp_path), 'jd40', ('dxf',))
+    hull = len(geometry['hull'][0])
+    for layer, cutout in (('plate', 'switches'), ('bezel_0', 'bezel'),
+                          ('bottom', None)):
+        pairs, entities = dxf_entities(
+            str(tmp_path / 'jd40-{}.dxf'.format(layer)))
+        assert ('9', '$INSUNITS') in pairs and ('70', '4') in pairs
+        kinds = [kind for kind, _ in entities]
+        assert kinds.count('ARC') == hull
+        assert kinds.count('LINE') == hull + sum(
+            len(polygon) for polygon in geometry.get(cutout) or [])
+        assert kinds.count('CIRCLE') == 4
+        assert all(values['8'] == layer for _, values in entities)
+        # Every segment end meets exactly one other segment's end
+        ends = collections.Counter(
+            (round(x, 3) + 0.0, round(y, 3) + 0.0)
+            for kind, values in entities if kind != 'CIRCLE'
+            for x, y in endpoints(kind, values))
+        assert set(ends.values()) == {2}
+    # The outline is in mm, the hull's width plus the offset on both sides
+    x0, _, x1, _ = geometry['bounds']
+    xs = [x for x, _ in ends]
+    assert max(xs) - min(xs) == pytest.approx(
+        (x1 - x0 + 2 * Config.OUTLINE_OFFSET) * 10, abs=1e-3)
+
+
+def test_svg_view_box_covers_the_outline(tmp_path, monkeypatch):
+    keys = jd40_keys(monkeypatch)
+    geometry = Export.layer_geometry(keys)
+    path, = Export.export_layout(keys, str(tmp_path), 'jd40', ('svg',))[2:3]
+    assert path.endswith('jd40-plate.svg')
+    root = xml.etree.ElementTree.parse(path).getroot()
+    x0, y0, x1, y1 = geometry['bounds']
+    margin = Config.OUTLINE_OFFSET
+    width, height = (x1 - x0 + 2 * margin) * 10, (y1 - y0 + 2 * margin) * 10
+    assert root.get('width') == '{:.6f}mm'.format(width)
+    assert root.get('height') == '{:.6f}mm'.format(height)
+    assert [float(v) for v in root.get('viewBox').split()] == pytest.approx(
+        [(x0 - margin) * 10, (-y1 - margin) * 10, width, height])
+    group, = root
+    assert group.get('id') == 'plate'
+    hull = len(geometry['hull'][0])
+    assert len(group) == 2 * hull + sum(
+        len(polygon) for polygon in geometry['switches'])
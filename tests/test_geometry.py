@@ -0,0 +1,68 @@
+from KeebGen.Modules import Geometry
+
+
+def normalized(loops):
+    # Loops start at their smallest point, so they compare independent of
+    # where the walk began
+    result = []
+    for loop in loops:
+        loop = [(round(x, 9), round(y, 9)) for x, y in loop]
+        i = loop.index(min(loop))
+        result.append(loop[i:] + loop[:i])
+    return sorted(result)
+
+
+def square(x0, y0, x1, y1):
+    return [(x0, y0), (x1, y0), (x1, y1), (x0, y1)]
+
+
+def test_union_merges_overlapping_squares():
+    loops = Geometry.union([square(0, 0, 2, 2), square(1, 1, 3, 3)])
+    assert normalized(loops) == [[(0, 0), (2, 0), (2, 1), (3, 1), (3, 3),
+                                  (1, 3), (1, 2), (0, 2)]]
+    assert Geometry.area(loops[0]) == 7
+
+
+def test_union_merges_touching_squares_and_drops_shared_edge():
+    loops = Geometry.union([square(0, 0, 1, 1), square(1, 0, 2, 1)])
+    assert normalized(loops) == [[(0, 0), (2, 0), (2, 1), (0, 1)]]
+
+
+def test_union_keeps_separate_polygons_apart():
+    loops = Geometry.union([square(0, 0, 1, 1), square(2, 0, 3, 1)])
+    assert len(loops) == 2
+
+
+def test_union_accepts_clockwise_input():
+    loops = Geometry.union([list(reversed(square(0, 0, 1, 1)))])
+    assert Geometry.area(loops[0]) == 1
+
+
+def test_union_leaves_a_hole():
+    ring = [square(0, 0, 3, 1), square(0, 2, 3, 3),
+            square(0, 0, 1, 3), square(2, 0, 3, 3)]
+    loops = Geometry.union(ring)
+    assert sorted(Geometry.area(loop) for loop in loops) == [-1, 9]
+
+
+def test_union_rectangles_matches_union():
+    boxes = [(0, 0, 2, 2), (1, 1, 3, 3), (5, 0, 6, 1), (2, 0, 3, 0.5)]
+    assert normalized(Geometry.union_rectangles(boxes)) == \
+        normalized(Geometry.union([square(*box) for box in boxes]))
+
+
+def test_union_rectangles_leaves_a_hole():
+    ring = [(0, 0, 3, 1), (0, 2, 3, 3), (0, 0, 1, 3), (2, 0, 3, 3)]
+    loops = Geometry.union_rectangles(ring)
+    assert sorted(Geometry.area(loop) for loop in loops) == [-1, 9]
+
+
+def test_union_of_nothing():
+    assert Geometry.union([]) == []
+    assert Geometry.union_rectangles([]) == []
+
+
+def test_union_rectangles_keeps_corner_touching_boxes_apart():
+    loops = Geometry.union_rectangles([(0, 0, 1, 1), (1, 1, 2, 2)])
+    assert normalized(loops) == [[(0, 0), (1, 0), (1, 1), (0, 1)],
+                                 [(1, 1), (2, 1), (2, 2), (1, 2)]]
@@ -0,0 +1,21 @@
+import json
+import os
+import pytest
+from KeebGen.Modules import Harness
+
+
+with open(Harness.BASELINE) as fp:
+    BASELINE = json.load(fp)
+
+
+@pytest.mark.parametrize('file_name', Harness.sample_layouts(),
+                         ids=os.path.basename)
+def test_sample_matches_baseline(file_name):
+    result = Harness.run_layout(file_name, insert_switches=True)
+    assert Harness.compare(result, BASELINE[os.path.basename(file_name)]) \
+        == []
+
+
+def test_every_sample_has_a_baseline():
+    names = {os.path.basename(f) for f in Harness.sample_layouts()}
+    assert names == set(BASELINE)
@@ -0,0 +1,60 @@
+import os
+import pytest
+from KeebGen.Modules import Config
+from KeebGen.Modules import KLE
+from KeebGen.Modules import Standin
+
+
+ROWS = [[{'p': 'DCS R3'}, 'a', {'p': 'DCS R1'}, 'b',
+         {'p': 'DCS R3', 'w': 2}, 'c', {'p': 'SA'}, 'd'],
+        [{'p': 'DCS R3'}, 'e', 'f']]
+
+
+def layout(rows):
+    # Keys in design units, as get_keys returns them
+    keys = KLE.deserialize(rows)
+    keys.offset()
+    keys.scale(Config.KEY_UNIT)
+    return keys
+
+
+@pytest.fixture
+def keycap_dir(app, tmp_path):
+    for name in ('1u.step', '1U-R3.STEP', '2u.stp', 'notes.txt'):
+        (tmp_path / name).write_text('')
+    return str(tmp_path)
+
+
+def test_model_files_prefer_the_profile_row(keycap_dir):
+    from KeebGen.Modules import Keycaps
+    files = Keycaps.model_files(layout(ROWS), keycap_dir)
+    assert [os.path.basename(f) for f in files] == [
+        '1U-R3.STEP', '1u.step', '2u.stp', '1u.step', '1U-R3.STEP',
+        '1U-R3.STEP']
+
+
+def test_model_names(app):
+    from KeebGen.Modules import Keycaps
+    unit = Config.KEY_UNIT
+    assert Keycaps.model_names(unit, unit, 3) == ['1u-r3', '1u']
+    assert Keycaps.model_names(2.25 * unit, unit, 0) == ['2.25u']
+    assert Keycaps.model_names(1.25 * unit, 2 * unit, 0) == ['1.25ux2u']
+
+
+def test_missing_models_are_listed(keycap_dir):
+    from KeebGen.Modules import Keycaps
+    keys = layout([[{'w': 1.5}, 'a', {'p': 'R2', 'w': 6.25}, 'b']])
+    with pytest.raises(ValueError, match='1.5u, 6.25u'):
+        Keycaps.model_files(keys, keycap_dir)
+
+
+def test_each_model_is_imported_once(app, monkeypatch, keycap_dir):
+    from KeebGen.Modules import Keycaps
+    monkeypatch.setattr(Config, 'KEYCAP_DIR', keycap_dir)
+    components = Keycaps.place_keycaps(layout(ROWS))
+    assert sorted(os.path.basename(f) for f in components) == [
+        '1U-R3.STEP', '1u.step', '2u.stp']
+    assert Standin.calls['ImportManager.importToTarget2'] == 3
+    # One cap per key: the three imported ones and three copies
+    occurrences = app.activeProduct.rootComponent.occurrences
+    assert occurrences.count == 6
@@ -0,0 +1,116 @@
+import io
+import json
+import pytest
+from KeebGen.Modules import Config
+from KeebGen.Modules import KLE
+
+
+def rows(text, chunk_size=1 << 16):
+    return list(KLE.iter_rows(io.BytesIO(text.encode('utf-8')), chunk_size))
+
+
+def test_iter_rows_matches_json():
+    text = json.dumps([{'name': 'test'}, ['Esc', {'w': 2}, 'Tab'],
+                       [{'r': 15, 'rx': 1}, 'A\n\né']])
+    assert rows(text) == json.loads(text)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7])
+def test_iter_rows_across_chunks(chunk_size):
+    text = ' [ ["éè", {"w": 1.5}, "x"] , ["y"] ] '
+    assert rows(text, chunk_size) == json.loads(text)
+
+
+def test_iter_rows_skips_bom_and_replaces_bad_bytes():
+    data = b'\xef\xbb\xbf[["a\xff"]]'
+    assert list(KLE.iter_rows(io.BytesIO(data))) == [['a�']]
+
+
+def test_iter_rows_empty_array():
+    assert rows('[]') == []
+
+
+@pytest.mark.parametrize('text', ['{"a": 1}', '[["a"]', '[["a"', ''])
+def test_iter_rows_rejects_broken_files(text):
+    with pytest.raises(ValueError):
+        rows(text)
+
+
+def test_get_keys_streams_the_file(tmp_path, monkeypatch):
+    # Hashing and parsing both read bounded chunks, never the whole file
+    sizes = []
+
+    class Reader(io.FileIO):
+        def read(self, size=-1):
+            sizes.append(size)
+            return super().read(size)
+
+    layout = tmp_path / 'layout.json'
+    layout.write_text(json.dumps([['a'] * 10] * 1000))
+    monkeypatch.setattr(KLE, 'open', lambda name, mode: Reader(name, mode),
+                        raising=False)
+    monkeypatch.setattr(Config, 'CACHE_DIR', str(tmp_path / 'cache'))
+    for use_cache in (False, True, True):
+        monkeypatch.setattr(Config, 'USE_CACHE', use_cache)
+        assert len(KLE.get_keys(str(layout))) == 10000
+    assert sizes and all(0 < size <= 1 << 16 for size in sizes)
+
+
+def key(keys, i):
+    return {field: keys.columns()[field][i] for field in KLE.FIELDS}
+
+
+def test_second_rectangle():
+    # ISO enter, and a key without a second rectangle
+    keys = KLE.deserialize([[{'x': 0.25, 'w': 1.25, 'h': 2, 'x2': -0.25,
+                              'w2': 1.5, 'h2': 1}, 'Enter', 'a']])
+    enter, other = key(keys, 0), key(keys, 1)
+    assert (enter['x'], enter['width'], enter['height']) == (0.25, 1.25, 2)
+    assert (enter['x2'], enter['y2'], enter['width2'], enter['height2']) \
+        == (-0.25, 0, 1.5, 1)
+    assert (other['x'], other['x2'], other['width2'], other['height2']) \
+        == (1.5, 0, 1, 1)
+
+
+def test_rotation_origin_resets_the_position():
+    keys = KLE.deserialize([
+        ['a', 'b'],
+        [{'r': 15, 'rx': 2, 'ry': 3}, 'c', 'd'],
+        ['e'],
+        [{'rx': 5, 'y': 1}, 'f']])
+    positions = [(key(keys, i)['x'], key(keys, i)['y'])
+                 for i in range(len(keys))]
+    # Rows in a cluster start at rx, one unit down per row, and a new rx
+    # starts over from the cluster's y
+    assert positions == [(0, 0), (1, 0), (2, 3), (3, 3), (2, 4), (5, 4)]
+    assert [key(keys, i)['rotation_angle'] for i in range(len(keys))] == \
+        [0, 0, 15, 15, 15, 15]
+
+
+def test_decals_are_skipped_one_key_at_a_time():
+    keys = KLE.deserialize([[{'d': True}, 'decal', 'a', {'d': True},
+                             'decal', 'b']])
+    assert list(keys.x) == [1, 3]
+
+
+def test_ghosting_sticks_until_turned_off():
+    keys = KLE.deserialize([[{'g': True}, 'a', 'b'], ['c', {'g': False},
+                                                       'd']])
+    assert (list(keys.x), list(keys.y)) == ([1], [1])
+
+
+def test_profile_rows():
+    keys = KLE.deserialize([[{'p': 'DCS R3'}, 'a', 'b', {'p': 'SA'}, 'c']])
+    assert list(keys.profile_row) == [3, 3, 0]
+
+
+def test_metadata_must_come_first():
+    with pytest.raises(ValueError, match='metadata'):
+        KLE.deserialize([['a'], {'name': 'late'}])
+    keys = KLE.deserialize([{'name': 'first'}, ['a']])
+    assert keys.meta == {'name': 'first'}
+
+
+def test_rotation_only_on_the_first_key():
+    with pytest.raises(ValueError, match='first key'):
+        KLE.deserialize([['a', {'r': 10}, 'b']])
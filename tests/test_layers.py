@@ -0,0 +1,119 @@
+import os
+import pytest
+from KeebGen.Modules import Config
+from KeebGen.Modules import Harness
+from KeebGen.Modules import Standin
+
+
+LAYOUT = os.path.join(Harness.SAMPLE_DATA, 'jd40.json')
+
+
+@pytest.fixture
+def design(app, monkeypatch):
+    monkeypatch.setattr(Config, 'INCREMENTAL', True)
+    build()
+    return app.activeProduct
+
+
+def build():
+    # Extrusions and sketches made by one run
+    from KeebGen import KeebGen
+    Standin.calls.clear()
+    KeebGen.main(LAYOUT)
+    return (Standin.calls['ExtrudeFeatures.add'],
+            Standin.calls['Sketch.deleteMe'])
+
+
+def bodies(design):
+    return {body.name: body for body in design.rootComponent.bRepBodies}
+
+
+def sketches(design):
+    return {sketch.name: sketch for sketch in design.rootComponent.sketches}
+
+
+def test_unchanged_rerun_makes_nothing(design):
+    before = bodies(design), sketches(design)
+    assert build() == (0, 0)
+    assert (bodies(design), sketches(design)) == before
+
+
+def test_thickness_is_edited_in_place(design, monkeypatch):
+    before = bodies(design)
+    monkeypatch.setattr(Config, 'BOTTOM_THICKNESS', 0.5)
+    assert build() == (0, 0)
+    after = bodies(design)
+    assert after == before
+    assert after['BOTTOM'].feature.extentOne.distance.value == 0.5
+    # Everything above the bottom moves up
+    assert after['PLATE'].feature.startExtent.offset.value == \
+        pytest.approx(1.1)
+
+
+@pytest.mark.parametrize('name, value', [('STABILIZERS', None),
+                                         ('SWITCH_DIAMETER', 1.3)])
+def test_switch_inputs_only_rebuild_the_plate(design, monkeypatch, name,
+                                             value):
+    before, sketches_before = bodies(design), sketches(design)
+    monkeypatch.setattr(Config, name, value)
+    # The plate's body and cut, from a new switch cutout sketch
+    assert build() == (2, 1)
+    after, sketches_after = bodies(design), sketches(design)
+    assert set(after) == set(before)
+    for layer in ('BEZEL_0', 'BEZEL_1', 'MID_0', 'MID_1', 'BOTTOM'):
+        assert after[layer] is before[layer]
+    assert after['PLATE'] is not before['PLATE']
+    assert sketches_after['switch-cutouts'] is not \
+        sketches_before['switch-cutouts']
+    for sketch in ('bezel', 'bezel-hull', 'bezel-hull-plus-10mm'):
+        assert sketches_after[sketch] is sketches_before[sketch]
+
+
+def test_changed_cutout_rebuilds_that_layer(design, monkeypatch):
+    from KeebGen.Modules import Stack
+    before = bodies(design)
+    stack = Stack.default_stack()
+    stack[-1] = ('bottom', Config.BOTTOM_THICKNESS, 'hull')
+    monkeypatch.setattr(Config, 'LAYER_STACK', stack)
+    # A body and a cut from the existing hull sketch
+    assert build() == (2, 0)
+    after = bodies(design)
+    assert after['BOTTOM'] is not before['BOTTOM']
+    assert all(after[name] is before[name] for name in before
+               if name != 'BOTTOM')
+
+
+def test_outline_change_rebuilds_everything(design, monkeypatch):
+    monkeypatch.setattr(Config, 'OUTLINE_OFFSET', 1.2)
+    # Five bodies with a cut and the solid bottom, from a new outline
+    assert build() == (11, 1)
+    assert len(bodies(design)) == 6
+    assert len(sketches(design)) == 4
+
+
+def test_layers_leaving_the_stack_are_removed(design, monkeypatch):
+    from KeebGen.Modules import Stack
+    monkeypatch.setattr(Config, 'LAYER_STACK', Stack.default_stack()[:3])
+    # The mid layers' hull sketch goes with them
+    assert build() == (0, 1)
+    after = bodies(design)
+    assert sorted(after) == ['BEZEL_0', 'BEZEL_1', 'PLATE']
+    assert after['PLATE'].feature.startExtent.offset.value == 0
+    assert sorted(sketches(design)) == [
+        'bezel', 'bezel-hull-plus-10mm', 'switch-cutouts']
+
+
+def test_hull_is_computed_once(app, monkeypatch):
+    from KeebGen.Modules import Geometry
+    hulls = []
+    convex_hull = Geometry.convex_hull
+
+    def counted(points):
+        hulls.append(points)
+        return convex_hull(points)
+
+    monkeypatch.setattr(Geometry, 'convex_hull', counted)
+    monkeypatch.setattr(Config, 'SCREW_HOLES', 4)
+    monkeypatch.setattr(Config, 'USB_POSITION', 'center')
+    build()
+    assert len(hulls) == 1
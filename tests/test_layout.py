@@ -0,0 +1,38 @@
+from KeebGen.Modules import Config
+from KeebGen.Modules import KLE
+from KeebGen.Modules import Layout
+
+
+def keys(*rows):
+    keys = KLE.deserialize(rows)
+    keys.offset()
+    keys.scale(Config.KEY_UNIT)
+    return keys
+
+
+def runs(*rows):
+    layout = keys(*rows)
+    world = Layout.world_placements(layout, 0, 0)
+    return Layout.pattern_runs(layout, Layout.relative_placements(world))
+
+
+def test_pattern_runs_at_constant_pitch():
+    # The first key is where the model was imported, it is never patterned
+    assert runs(['a', 'b', 'c', 'd', {'x': 1}, 'e', 'f', 'g']) == [
+        [1, 2, 3], [4, 5, 6]]
+
+
+def test_short_runs_are_single_keys():
+    assert runs(['a', 'b', 'c', {'x': 1}, 'd']) == [[1], [2], [3]]
+
+
+def test_stacked_keys_are_not_patterned():
+    # Alternate layout keys on the same spot have a pitch of zero
+    assert runs(['a', 'b', {'x': -1}, 'c', {'x': -1}, 'd']) == [
+        [1], [2], [3]]
+    assert runs(['a', 'b', 'c', 'd', {'x': -1}, 'e', 'f', 'g']) == [
+        [1, 2, 3], [4, 5, 6]]
+
+
+def test_rotated_keys_are_not_patterned():
+    assert runs([{'r': 10}, 'a', 'b', 'c', 'd']) == [[1], [2], [3]]
@@ -0,0 +1,101 @@
+import math
+import pytest
+from KeebGen.Modules import Config
+from KeebGen.Modules import Geometry
+from KeebGen.Modules import KLE
+from KeebGen.Modules import Layout
+from KeebGen.Modules import Mounting
+
+
+def layout(rows):
+    # Keys in design units, as get_keys returns them
+    keys = KLE.deserialize(rows)
+    keys.offset()
+    keys.scale(Config.KEY_UNIT)
+    return keys
+
+
+def distance(point, polygon):
+    # Distance from a point to the outline of a polygon
+    px, py = point
+    best = math.inf
+    for (ax, ay), (bx, by) in zip(polygon, polygon[1:] + polygon[:1]):
+        dx, dy = bx - ax, by - ay
+        t = ((px - ax) * dx + (py - ay) * dy) / (dx * dx + dy * dy)
+        t = min(1, max(0, t))
+        best = min(best, math.hypot(px - ax - t * dx, py - ay - t * dy))
+    return best
+
+
+# The leftmost key starts a unit in, the layout's left edge is not x = 0
+ROWS = [[{'x': 1}, 'a', 'b', 'c', 'd'], [{'x': 1}, 'e', {'w': 2}, 'f', 'g'],
+        [{'x': 1}, 'h', 'i', 'j', 'k']]
+
+
+@pytest.fixture
+def keys():
+    return layout(ROWS)
+
+
+def test_usb_is_measured_from_the_leftmost_key(keys, monkeypatch):
+    monkeypatch.setattr(Config, 'USB_POSITION', 1.5)
+    usb = Mounting.mounting(keys)['usb']
+    x0, y0, x1, y1 = Geometry.bounds(usb)
+    left = min(x - w / 2 for x, w in zip(keys.x, keys.width))
+    assert (x0 + x1) / 2 == pytest.approx(left + 1.5 * Config.KEY_UNIT)
+    assert x1 - x0 == pytest.approx(Config.USB_WIDTH)
+    # From inside the hull out past the top edge of the case
+    top = max(y + h / 2 for y, h in zip(keys.y, keys.height))
+    assert y0 < top + Config.BEZEL_KEY_BUFFER
+    assert y1 > top + Config.BEZEL_KEY_BUFFER + Config.OUTLINE_OFFSET
+
+
+def test_usb_center(keys, monkeypatch):
+    monkeypatch.setattr(Config, 'USB_POSITION', 'center')
+    x0, y0, x1, y1 = Geometry.bounds(Mounting.mounting(keys)['usb'])
+    left = min(x - w / 2 for x, w in zip(keys.x, keys.width))
+    right = max(x + w / 2 for x, w in zip(keys.x, keys.width))
+    assert (x0 + x1) / 2 == pytest.approx((left + right) / 2)
+
+
+def test_usb_outside_the_case(keys, monkeypatch):
+    monkeypatch.setattr(Config, 'USB_POSITION', 10)
+    with pytest.raises(ValueError, match='outside'):
+        Mounting.mounting(keys)
+    monkeypatch.setattr(Config, 'USB_POSITION', None)
+    assert Mounting.mounting(keys)['usb'] is None
+
+
+@pytest.mark.parametrize('usb', [None, 2])
+def test_screw_holes_keep_their_clearance(keys, monkeypatch, usb):
+    monkeypatch.setattr(Config, 'SCREW_HOLES', 6)
+    monkeypatch.setattr(Config, 'USB_POSITION', usb)
+    hull = Geometry.convex_hull(Layout.points(Layout.bezel_cutouts(keys)))
+    result = Mounting.mounting(keys, hull)
+    holes = result['screw_holes']
+    assert len(holes) == 6
+    keep_out = Config.SCREW_DIAMETER / 2 + Config.SCREW_CLEARANCE
+    for hole in holes:
+        # Outside the convex hull the case edge is OUTLINE_OFFSET out
+        assert not Geometry.contains(hull, *hole)
+        assert keep_out - 1e-9 <= distance(hole, hull) <= \
+            Config.OUTLINE_OFFSET - keep_out + 1e-9
+        if result['usb']:
+            x0, y0, x1, y1 = Geometry.bounds(result['usb'])
+            assert not (x0 - keep_out < hole[0] < x1 + keep_out and
+                        y0 - keep_out < hole[1] < y1 + keep_out)
+    for i, a in enumerate(holes):
+        for b in holes[i + 1:]:
+            assert math.hypot(a[0] - b[0], a[1] - b[1]) >= \
+                Config.SCREW_DIAMETER + Config.SCREW_CLEARANCE
+
+
+def test_screw_holes_need_room(keys, monkeypatch):
+    monkeypatch.setattr(Config, 'SCREW_HOLES', 4)
+    monkeypatch.setattr(Config, 'OUTLINE_OFFSET', 0.4)
+    with pytest.raises(ValueError, match='OUTLINE_OFFSET'):
+        Mounting.mounting(keys)
+    monkeypatch.setattr(Config, 'OUTLINE_OFFSET', 1)
+    monkeypatch.setattr(Config, 'SCREW_HOLES', 1000)
+    with pytest.raises(ValueError, match='Only room for'):
+        Mounting.mounting(keys)
@@ -0,0 +1,56 @@
+import os
+import pytest
+from KeebGen.Modules import Config
+from KeebGen.Modules import KLE
+from KeebGen.Modules import Standin
+
+
+@pytest.fixture
+def switches(app, monkeypatch, tmp_path):
+    # Switch insertion with the model library in a fresh cache directory
+    monkeypatch.setattr(Config, 'USE_CACHE', True)
+    monkeypatch.setattr(Config, 'CACHE_DIR', str(tmp_path / 'cache'))
+    monkeypatch.setattr(Config, 'SWITCH_FILE', None)
+    monkeypatch.setattr(Standin.core.FileDialog, 'queued', [])
+    step_file = tmp_path / 'switch.step'
+    step_file.write_text('ISO-10303-21;')
+    return app, str(step_file)
+
+
+def insert(app):
+    # The switch component inserted into a new design
+    from KeebGen.Modules import Switches
+    app.documents.add(Standin.core.DocumentTypes.FusionDesignDocumentType)
+    Standin.calls.clear()
+    keys = KLE.KeyTable(meta={})
+    component, occurrence = Switches.switch_component(
+        app.activeProduct, Switches.switch_model(keys))
+    return component.name
+
+
+def test_switch_file_is_only_asked_for_once(switches):
+    app, step_file = switches
+    Standin.core.FileDialog.queued.append(step_file)
+    assert insert(app) == step_file
+    assert Standin.calls['FileDialog.showOpen'] == 1
+    # Later runs load the archived model without asking
+    assert insert(app).endswith('.f3d')
+    assert Standin.calls['FileDialog.showOpen'] == 0
+
+
+def test_edited_switch_file_is_imported_again(switches, monkeypatch):
+    app, step_file = switches
+    monkeypatch.setattr(Config, 'SWITCH_FILE', step_file)
+    assert insert(app) == step_file
+    assert insert(app).endswith('.f3d')
+    stat = os.stat(step_file)
+    os.utime(step_file, (stat.st_atime, stat.st_mtime + 10))
+    assert insert(app) == step_file
+    assert Standin.calls['FileDialog.showOpen'] == 0
+
+
+def test_switch_type_without_a_model_is_an_error(switches):
+    from KeebGen.Modules import Switches
+    keys = KLE.KeyTable(meta={'switchMount': 'choc'})
+    with pytest.raises(ValueError, match='choc'):
+        Switches.switch_model(keys)
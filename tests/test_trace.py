@@ -0,0 +1,50 @@
+import json
+import tracemalloc
+import pytest
+from KeebGen.Modules import Config
+from KeebGen.Modules import Trace
+
+
+def peaks():
+    return {event['name']: event['args']['peak_memory_kb']
+            for event in Trace.events}
+
+
+def test_each_stage_has_its_own_peak(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'TRACE', True)
+    monkeypatch.setattr(Config, 'TRACE_FILE', str(tmp_path / 'trace.json'))
+    Trace.start()
+    with Trace.stage('outer'):
+        with Trace.stage('big'):
+            data = bytearray(4 << 20)
+            del data
+        with Trace.stage('small'):
+            data = bytearray(1 << 10)
+            del data
+    with Trace.stage('after'):
+        pass
+    path = Trace.finish('layout.json')
+    result = peaks()
+    assert result['big'] >= 4096
+    assert result['small'] < 1024
+    assert result['after'] < 1024
+    # A stage's peak includes its nested stages
+    assert result['outer'] >= result['big']
+    with open(path) as fp:
+        assert json.load(fp)['otherData']['peak_memory_kb'] >= 4096
+    assert not tracemalloc.is_tracing()
+
+
+def test_failed_run_still_writes_the_trace(app, tmp_path, monkeypatch):
+    from KeebGen import KeebGen
+    monkeypatch.setattr(Config, 'TRACE', True)
+    monkeypatch.setattr(Config, 'TRACE_FILE', str(tmp_path / 'trace.json'))
+    layout = tmp_path / 'broken.json'
+    layout.write_text('[["a"]')
+    with pytest.raises(ValueError):
+        KeebGen.main(str(layout))
+    assert not tracemalloc.is_tracing()
+    assert not Trace.enabled()
+    with open(str(tmp_path / 'trace.json')) as fp:
+        names = [event['name'] for event in json.load(fp)['traceEvents']]
+    assert names == ['main.get_keys']
@@ -0,0 +1,50 @@
+import pytest
+from KeebGen.Modules import Config
+from KeebGen.Modules import KLE
+from KeebGen.Modules import Validate
+
+
+def keys(*rows):
+    keys = KLE.deserialize(rows)
+    keys.offset()
+    keys.scale(Config.KEY_UNIT)
+    return keys
+
+
+def test_regular_layout_is_fine():
+    assert Validate.check(keys(['a', 'b', 'c'], [{'w': 1.5}, 'd', 'e'])) \
+        == []
+    Validate.validate(keys(['a', 'b']))
+
+
+def test_overlapping_keys():
+    problems = Validate.overlapping_keys(keys(['a', {'x': -0.5}, 'b']))
+    assert len(problems) == 1
+    assert problems[0].startswith('Keycaps 1 and 2 overlap')
+
+
+def test_keys_that_touch_dont_overlap():
+    assert Validate.overlapping_keys(keys(['a', 'b'])) == []
+
+
+def test_thin_webs(monkeypatch):
+    monkeypatch.setattr(Config, 'MIN_WEB_THICKNESS', 0.6)
+    problems = Validate.thin_webs(keys(['a', 'b']))
+    assert len(problems) == 1
+    assert problems[0].startswith('Switch cutouts 1 and 2 leave')
+    monkeypatch.setattr(Config, 'MIN_WEB_THICKNESS', 0.4)
+    assert Validate.thin_webs(keys(['a', 'b'])) == []
+
+
+def test_invalid_keys_skip_geometry_checks():
+    problems = Validate.check(keys([{'w': -1}, 'a', {'x': -0.5}, 'b']))
+    assert problems == ['Key 1 has no width or height']
+
+
+def test_validate_raises_with_every_problem():
+    with pytest.raises(Validate.LayoutError) as error:
+        Validate.validate(keys(['a', {'x': -0.5}, 'b', {'x': -0.5}, 'c']))
+    message = str(error.value)
+    assert message.startswith('The layout has 4 problem(s):')
+    assert 'Keycaps 1 and 2 overlap' in message
+    assert 'Keycaps 2 and 3 overlap' in message